@@ -1,4 +1,6 @@
-__all__ = ['TradingBot', 'BacktestingBot', 'DataHandler', 'algos']
+__all__ = ['TradingBot', 'BacktestingBot', 'PortfolioBot', 'AsyncTradingBot', 'DataHandler', 'algos']
 from freqbot.tradingbot import TradingBot
 from freqbot.backtestingbot import BacktestingBot
+from freqbot.portfolio import PortfolioBot
+from freqbot.engine import AsyncTradingBot
 from freqbot.database import DataHandler
@@ -1,31 +1,110 @@
 from pandas import DataFrame
-import pandas as pd
+from typing import Tuple, NoReturn, Union
+import numpy as np
+
+from freqbot.barstore import BarStore
 
 
 class BasicAlgorithm:
-    def __init__(self, tick_type: str, tick_size, order_type: str = 'MARKET'):
+    # bars that evaluation of the newest bar needs, the store keeps this many. Algorithms that compute indicators
+    # from the frame need their warmup here, incremental ones only the window of their conditions.
+    lookback = 1000
+    # signal that closes a trade: action always asked buy_trend for SELL decisions too, 'sell' exits on sell signals
+    exit_signal = 'buy'
+
+    def __init__(self, tick_type: str, tick_size, order_type: str = 'MARKET', lookback: int = None):
+        """
+        :param lookback: number of kept bars instead of the lookback the algorithm declares
+        """
         self.tick_type = tick_type
         self.tick_size = tick_size
         self.order_type = order_type
         self.price = 0
-        self.data = pd.DataFrame()
+        self.lookback = lookback if lookback is not None else type(self).lookback
+        self.store = BarStore(self.lookback)
         self.roi = {"100": 0.02}
         self.stoploss = -2
+        self.roi_schedule = None  # RoiSchedule compiled by the bot from roi and stoploss
+        self.incremental = False
+        self.reset_indicators()
+
+    @property
+    def data(self) -> DataFrame:
+        """
+        :return: last lookback bars (with indicators of incremental algorithms) as a view over the store
+        """
+        return self.store.frame()
+
+    def set_state(self, state: DataFrame) -> NoReturn:
+        if not self.incremental:
+            self.store.extend(state)
+            return
+        for time, bar in zip(state.index, state.to_dict('records')):
+            self.store.append(bar, time)
+            self.store.set_last(self.next_indicators(bar))
 
-    def set_state(self, state):
-        self.data = self.data.append(state, ignore_index=True)
+    def reset_indicators(self) -> NoReturn:
+        """
+        Creates rolling state of incremental indicators, algorithms that implement next_indicators extend it
+        """
+        pass
 
     def update_indicators(self, dataframe: DataFrame) -> DataFrame:
-        raise NotImplemented
+        raise NotImplementedError
+
+    def next_indicators(self, bar: dict) -> dict:
+        """
+        Incremental version of update_indicators, it is called by set_state for every new bar
+        :param bar: the newest bar
+        :return: values of the indicators for this bar, computed from rolling state in O(1)
+        """
+        raise NotImplementedError
 
     def buy_trend(self, dataframe: DataFrame) -> bool:
-        raise NotImplemented
+        raise NotImplementedError
 
     def sell_trend(self, dataframe: DataFrame) -> bool:
-        raise NotImplemented
+        raise NotImplementedError
+
+    def populate_signals(self, dataframe: DataFrame) -> DataFrame:
+        """
+        Evaluates every bar of the frame at once, for backtests. Algorithms that only implement buy_trend
+        and sell_trend get the signals from them, sell_trend is asked only if the algorithm exits on it.
+        :param dataframe: bars with indicators
+        :return: the frame with boolean buy and sell columns
+        """
+        self.buy_trend(dataframe)
+        dataframe['buy'] = (dataframe['buy'] == 1).to_numpy()
+        if self.exit_signal == 'sell':
+            self.sell_trend(dataframe)
+            dataframe['sell'] = (dataframe['sell'] == 1).to_numpy()
+        else:
+            dataframe['sell'] = False
+        return dataframe
+
+    def last_signals(self, data: Union[DataFrame, BarStore]) -> Tuple[bool, bool]:
+        """
+        Evaluates only the newest bar, for live trading and bar by bar backtests. Algorithms override it
+        to read just the last values their conditions need, by default populate_signals runs over all the data.
+        :param data: bars with indicators, the store of incremental algorithms, data[column] gives the values
+        of a column from the oldest bar to the newest one
+        :return: buy and sell signals of the newest bar
+        """
+        frame = self.populate_signals(data.frame() if isinstance(data, BarStore) else data)
+        return bool(frame['buy'].iat[-1]), bool(frame['sell'].iat[-1])
 
     def action(self, is_trading: bool):
-        self.update_indicators(self.data)
+        data = self.store if self.incremental else self.update_indicators(self.data)
+        buy, sell = self.last_signals(data)
         if not is_trading:
-            return 'BUY' if self.buy_trend(self.data) else None
-        return 'SELL' if self.buy_trend(self.data) else None
+            return 'BUY' if buy else None
+        return 'SELL' if (sell if self.exit_signal == 'sell' else buy) else None
+
+    def signals(self, dataframe: DataFrame) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Evaluates buy and sell decisions for every bar of the frame at once, exactly as action does bar by bar
+        :param dataframe: bars the algorithm would receive one by one through set_state
+        :return: boolean arrays of BUY and SELL decisions
+        """
+        dataframe = self.populate_signals(self.update_indicators(dataframe.reset_index(drop=True)))
+        return dataframe['buy'].to_numpy(dtype=bool), dataframe[self.exit_signal].to_numpy(dtype=bool)
@@ -1,19 +1,34 @@
 from freqbot.algos import BasicAlgorithm
 from pandas import DataFrame
+from typing import Tuple
+import numpy as np
 import pandas as pd
 import talib.abstract as ta
 import freqtrade.vendor.qtpylib.indicators as qtpylib
+from freqbot.indicators import SMA, TEMA, MACD, ADX, BollingerBands
 
 
 class Quickie(BasicAlgorithm):
-    def __init__(self, tick_type: str, tick_size, order_type: str = 'MARKET'):
-        super().__init__(tick_type, tick_size, order_type)
+    # indicators are incremental, conditions compare tema with the bar before
+    lookback = 2
+
+    def __init__(self, tick_type: str, tick_size, order_type: str = 'MARKET', lookback: int = None):
+        super().__init__(tick_type, tick_size, order_type, lookback)
         self.roi = {
             "100": 0.01,
             "30": 0.03,
             "15": 0.06,
             "10": 0.15,
         }
+        self.incremental = True
+
+    def reset_indicators(self):
+        super().reset_indicators()
+        self.macd = MACD(12, 26, 9)
+        self.tema = TEMA(9)
+        self.sma_200 = SMA(200)
+        self.adx = ADX(14)
+        self.bollinger = BollingerBands(20, 2)
 
     def update_indicators(self, dataframe: DataFrame) -> DataFrame:
         macd = ta.MACD(dataframe)
@@ -34,6 +49,52 @@ class Quickie(BasicAlgorithm):
 
         return dataframe
 
+    def next_indicators(self, bar: dict) -> dict:
+        indicators = dict()
+        indicators['macd'], indicators['macdsignal'], indicators['macdhist'] = self.macd.update(bar['close'])
+
+        indicators['tema'] = self.tema.update(bar['close'])
+        indicators['sma_200'] = self.sma_200.update(bar['close'])
+        indicators['sma_50'] = indicators['sma_200']  # update_indicators uses timeperiod=200 for it too
+
+        indicators['adx'] = self.adx.update(bar['high'], bar['low'], bar['close'])
+
+        lower, mid, upper = self.bollinger.update(bar['close'])
+        indicators['bb_lowerband'] = lower
+        indicators['bb_middleband'] = mid
+        indicators['bb_upperband'] = upper
+
+        return indicators
+
+    @staticmethod
+    def buy_condition(adx, tema, previous_tema, bb_middleband, sma_200, close):
+        """
+        Works on arrays of all bars and on values of one bar alike, comparisons with NaN are False
+        """
+        return (adx > 30) & (tema < bb_middleband) & (tema > previous_tema) & (sma_200 > close)
+
+    @staticmethod
+    def sell_condition(adx, tema, previous_tema, bb_middleband):
+        return (adx > 70) & (tema > bb_middleband) & (tema < previous_tema)
+
+    def populate_signals(self, dataframe: DataFrame) -> DataFrame:
+        columns = {column: dataframe[column].to_numpy(dtype=float)
+                   for column in ('adx', 'tema', 'bb_middleband', 'sma_200', 'close')}
+        previous_tema = np.concatenate(([np.nan], columns['tema'][:-1]))
+        dataframe['buy'] = self.buy_condition(columns['adx'], columns['tema'], previous_tema,
+                                              columns['bb_middleband'], columns['sma_200'], columns['close'])
+        dataframe['sell'] = self.sell_condition(columns['adx'], columns['tema'], previous_tema,
+                                                columns['bb_middleband'])
+        return dataframe
+
+    def last_signals(self, data) -> Tuple[bool, bool]:
+        tema = np.asarray(data['tema'])[-2:]
+        previous_tema = tema[0] if tema.shape[0] > 1 else np.nan
+        adx, bb_middleband = np.asarray(data['adx'])[-1], np.asarray(data['bb_middleband'])[-1]
+        buy = self.buy_condition(adx, tema[-1], previous_tema, bb_middleband, np.asarray(data['sma_200'])[-1],
+                                 np.asarray(data['close'])[-1])
+        return bool(buy), bool(self.sell_condition(adx, tema[-1], previous_tema, bb_middleband))
+
     def buy_trend(self, dataframe: DataFrame) -> bool:
         dataframe.loc[
             (
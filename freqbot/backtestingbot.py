@@ -1,26 +1,133 @@
 import numpy as np
 import pandas as pd
 import os
-import freqml as fm
+import copy
+import time
+import glob
+import itertools
 import concurrent.futures
-from typing import Union, List, Dict, NoReturn
+from typing import Union, List, Dict, NoReturn, Tuple
 from freqml import *
 
 from freqbot import TradingBot
-from freqbot.tradingbot import OrderMetadata
-from freqbot.database import DataHandler
-from freqbot.tools import timedelta2seconds
+from freqbot.tradingbot import OrderMetadata, load_history
+from freqbot.tradestore import TradeSource
+from freqbot.database import ResultCollector, SummaryTable
+from freqbot.resultstore import open_store
+from freqbot.tools import timedelta2seconds, time2stamp, index2nanoseconds, index2stamps
+from freqbot.records import TRADE_DTYPE
 from freqbot.algos import BasicAlgorithm
-from freqbot.logging import get_logger
+from freqbot.logging import get_logger, worker_queue, forward_logs
+from freqbot.shared import SharedFrame, SharedFrames
+from freqbot.cache import BarCache
+from freqbot.roi import RoiSchedule
+from freqbot.profiling import TaskProfile, NULL_PROFILE, report, merge_cprofile, profile_path
+
+
+# bot of a worker process, the pool initializer sends it once instead of pickling it with every task
+worker_bot = None
+# numbers of profiled tasks of a worker process, they make names of cProfile stats unique
+task_numbers = itertools.count()
+
+
+def init_worker(bot: 'BacktestingBot', log_queue=None) -> NoReturn:
+    """
+    :param log_queue: records of the logger of the bot are forwarded to it, see logging.worker_queue
+    """
+    global worker_bot
+    worker_bot = bot
+    if log_queue is not None:
+        worker_bot.logger = forward_logs(bot.logger.name, log_queue)
+
+
+def make_tick_frames(new_data: pd.DataFrame, tick_types: List[str], pair: str = None,
+                     cache: BarCache = None) -> Dict[str, pd.DataFrame]:
+    """
+    Builds bars of every tick type, bars found in cache are loaded from it instead
+    """
+    source = BarCache.source_key(new_data) if cache else None
+    tick_frames = dict()
+    for tick_type in tick_types:
+        states = cache.load(pair, tick_type, source) if cache else None
+        if states is None:
+            t_type, t_size = tick_type.split('_')
+            states = getattr(new_data.bars, t_type)(int(t_size))
+            if cache:
+                cache.save(pair, tick_type, source, states)
+        tick_frames[tick_type] = states
+    return tick_frames
+
+
+def load_pair(source: TradeSource, pair: str, days: int, path: str, override: bool, tick_types: List[str],
+              cache: bool = True) -> Tuple[Dict[str, pd.DataFrame], float, float]:
+    """
+    Loads trades of one pair and builds bars of every tick type from them, it runs in a worker process
+    :return: bars by tick type, seconds spent on loading and on building bars
+    """
+    start = time.perf_counter()
+    new_data = load_history(source, pair, days, path, override)
+    loaded = time.perf_counter()
+    tick_frames = make_tick_frames(new_data, tick_types, pair, BarCache(path) if cache else None)
+    return tick_frames, loaded - start, time.perf_counter() - loaded
+
+
+def run_task(algo: BasicAlgorithm, pair: SharedFrame, stake_amount: int, vectorized: bool,
+             profile: str = None, path: str = None) -> ResultCollector:
+    """
+    :param profile: phases or cprofile, timings of the task are returned as profile of the collector
+    :param path: directory that cProfile stats of the task are written to
+    """
+    backtest_algo_pair = worker_bot.backtest_algo_pair_vectorized if vectorized else worker_bot.backtest_algo_pair
+    if profile is None:
+        return backtest_algo_pair(algo, pair.attach(), stake_amount, pair.name)
+
+    assert profile in ['phases', 'cprofile']
+    key = (worker_bot.algo_name(algo), pair.name, algo.tick_type + '_' + str(algo.tick_size))
+    filename = '_'.join(key) + '_{}_{}.prof'.format(os.getpid(), next(task_numbers))
+    task = TaskProfile(*key, cprofile_path=os.path.join(path, filename) if profile == 'cprofile' else None)
+    worker_bot.task_profile = task
+    try:
+        with task:
+            with task.phase('data_prep'):
+                frame = pair.attach()
+            collector = backtest_algo_pair(algo, frame, stake_amount, pair.name)
+    finally:
+        worker_bot.task_profile = NULL_PROFILE
+    collector.profile = task.line()
+    return collector
+
+
+def run_walk_forward_task(algo: BasicAlgorithm, pair: SharedFrame, stake_amount: int,
+                          windows: List[tuple]) -> List[Tuple[int, str, list]]:
+    return worker_bot.walk_forward_algo_pair(algo, pair.attach(), stake_amount, pair.name, windows)
+
+
+def walk_forward_windows(start: pd.Timestamp, end: pd.Timestamp, in_sample: pd.Timedelta,
+                         out_of_sample: pd.Timedelta, step: pd.Timedelta = None) -> List[tuple]:
+    """
+    Rolling windows that fit between start and end
+    :param step: shift of every next window, out_of_sample by default so out-of-sample periods follow each other
+    :return: start of the in-sample period, its end (start of the out-of-sample period) and the end of the window
+    """
+    step = step if step is not None else out_of_sample
+    windows = list()
+    while start + in_sample + out_of_sample <= end:
+        windows.append((start, start + in_sample, start + in_sample + out_of_sample))
+        start += step
+    return windows
 
 
 class BacktestingBot(TradingBot):
-    def __init__(self, key, secret):
-        super().__init__(key, secret)
+    commission = 0.00075
+
+    def __init__(self, key, secret, client=None):
+        super().__init__(key, secret, client=client)
         self.pairs: List[str] = list()
         self.algos: List[str] = list()
         self.tick2algo: Dict[str, List[BasicAlgorithm]] = dict()
         self.tick_pair_frames: Dict[str, List[pd.Dataframes]] = dict()
+        self.task_profile: TaskProfile = NULL_PROFILE  # of the running backtest task
+        self.profile_report: Union[pd.DataFrame, None] = None
 
     def trade(self, pair, days, algorithm, override: bool = True, stake_amount: int = 10) -> NoReturn:
         raise AttributeError
@@ -40,6 +147,7 @@ class BacktestingBot(TradingBot):
             self.algos.append(algo_name)
             algo.roi = {float(key): value for key, value in algo.roi.items()}
             algo.roi[np.inf] = 0
+            algo.roi_schedule = RoiSchedule(algo.roi, algo.stoploss)
             tick_type = get_tick_type(algo)
             self.tick_pair_frames[tick_type] = list()
             if tick_type in self.tick2algo:
@@ -48,23 +156,53 @@ class BacktestingBot(TradingBot):
                 self.tick2algo[tick_type] = [algo]
 
     def update_tick_pair_frames(self, new_data: pd.DataFrame, pair: str):
-        for tick_type in self.tick_pair_frames:
-            t_type, t_size = tick_type.split('_')
-            states = getattr(new_data.bars, t_type)(int(t_size))
+        self.add_tick_frames(make_tick_frames(new_data, list(self.tick_pair_frames)), pair)
+
+    def add_tick_frames(self, tick_frames: Dict[str, pd.DataFrame], pair: str):
+        for tick_type, states in tick_frames.items():
             states.name = pair
             self.tick_pair_frames[tick_type].append(states)
 
-    def get_historical_data(self, pairs: List[str], days: int, override: bool) -> NoReturn:
+    def worker_copy(self) -> 'BacktestingBot':
+        """
+        :return: copy of the bot without loaded data, it is what worker processes need to run tasks
+        """
+        bot = copy.copy(self)
+        bot.tick_pair_frames = dict()
+        bot.tick2algo = dict()
+        bot.client = None
+        bot.trade_source = None
+        return bot
+
+    def get_historical_data(self, pairs: List[str], days: int, override: bool, workers: int = None,
+                            cache: bool = True) -> NoReturn:
+        """
+        Loads pairs and builds their bars in a pool of worker processes, so bars of one pair are built
+        while the next pairs are still loading
+        :param workers: size of the pool, 1 loads everything in this process
+        :param cache: take bars built from the same raw trades from historical_data/bars/ instead of building them
+        """
         path = os.path.abspath(__file__)
         path = "/".join(path.split('/')[:-2]) + '/historical_data/'
-        for pair in pairs:
-            new_data = fm.load_dataset(client=self.client,
-                                       pair=pair,
-                                       days=days,
-                                       path=path,
-                                       override=override)
-            self.logger.info(pair + ' DATA FOR ' + str(days) + ' DAY(S) WAS DOWNLOADED')
-            self.update_tick_pair_frames(new_data, pair)   # multiprocessing
+        tick_types = list(self.tick_pair_frames)
+        if workers == 1:
+            loaded = (load_pair(self.trade_source, pair, days, path, override, tick_types, cache) for pair in pairs)
+            for pair, (tick_frames, load_time, bars_time) in zip(pairs, loaded):
+                self.log_loaded_pair(pair, days, load_time, bars_time)
+                self.add_tick_frames(tick_frames, pair)
+            return
+
+        with concurrent.futures.ProcessPoolExecutor(max_workers=workers) as executor:
+            futures = [executor.submit(load_pair, self.trade_source, pair, days, path, override, tick_types, cache)
+                       for pair in pairs]
+            for pair, future in zip(pairs, futures):
+                tick_frames, load_time, bars_time = future.result()
+                self.log_loaded_pair(pair, days, load_time, bars_time)
+                self.add_tick_frames(tick_frames, pair)
+
+    def log_loaded_pair(self, pair: str, days: int, load_time: float, bars_time: float) -> NoReturn:
+        self.logger.info(pair + ' DATA FOR ' + str(days) + ' DAY(S) WAS DOWNLOADED IN ' +
+                         '{:.2f}'.format(load_time) + ' S, BARS WERE BUILT IN ' + '{:.2f}'.format(bars_time) + ' S')
 
     def df_gen(self, df: pd.DataFrame) -> pd.DataFrame:
         n = df.shape[0]
@@ -72,7 +210,7 @@ class BacktestingBot(TradingBot):
             yield df.iloc[i: i + 1]
 
     def roi_stoploss_backtest_check(self, meta: OrderMetadata, state: pd.DataFrame,
-                                    roi: dict, stoploss: int) -> Union[float, None]:
+                                    schedule: RoiSchedule) -> Union[float, None]:
 
         if not meta.start_price:
             return False
@@ -81,30 +219,26 @@ class BacktestingBot(TradingBot):
 
         diff = state.index[0] - meta.start_time
         diff = timedelta2seconds(diff)
-        keys = np.array(list(roi.keys()))
-        key = np.min(keys[keys * 60 - diff > 0])
-        profit_price = meta.start_price * (1 + roi[key])
-        if price > profit_price:
-            meta.set_sell_reason('ROI')
-            return profit_price
-        loss_price = meta.start_price * (1 + stoploss)
-        if price < loss_price:
-            meta.set_sell_reason('STOPLOSS')
-            return loss_price
-        return None
+        found = schedule.check(meta.start_price, price, diff)
+        if found is None:
+            return None
+        end_price, sell_reason = found
+        meta.set_sell_reason(sell_reason)
+        return end_price
 
     def buy_handling(self, meta: OrderMetadata, state: pd.DataFrame, stake_amount: int) -> OrderMetadata:
-        commission = 0.00075
+        commission = self.commission
         start_price = float(state['close'])
         meta.set_start_price(start_price)
         meta.set_quantity(stake_amount / start_price)
         meta.fee = stake_amount * commission
         meta.start_time = state.index[0]
         meta.ctime = state.index[0].ctime()
+        meta.open_time = time2stamp(state.index[0])
         return meta
 
     def sell_handling(self, meta: OrderMetadata, state: pd.DataFrame, end_price: float = None) -> OrderMetadata:
-        commission = 0.00075
+        commission = self.commission
         if not end_price:
             end_price = float(state['close'])
         meta.set_end_price(end_price)
@@ -113,66 +247,259 @@ class BacktestingBot(TradingBot):
         meta.start_time = 0
         return meta
 
-    def backtest_algo_pair(self, algo: BasicAlgorithm, pair: pd.DataFrame, stake_amount: int, name: str) -> NoReturn:
+    def close_trade(self, collector: ResultCollector, meta: OrderMetadata, state: pd.DataFrame, name: str,
+                    end_price: float = None) -> OrderMetadata:
+        start_time = meta.start_time
+        meta = self.sell_handling(meta, state, end_price)
+        collector.trades.append(start_time, meta.end_time, meta.start_price, meta.end_price, meta.quantity, meta.fee,
+                                name, meta.algorithm_name, meta.sell_reason, meta.order_type, meta.limit_type)
+        meta.flush()
+        meta.pair = name
+        meta.order_type = 'MARKET'
+        return meta
+
+    def backtest_algo_pair(self, algo: BasicAlgorithm, pair: pd.DataFrame, stake_amount: int,
+                           name: str) -> ResultCollector:
         is_trading = False
-        data_handler = DataHandler('backtest')
+        collector = ResultCollector()
         meta = OrderMetadata()
         meta.order_type = 'MARKET'
         meta.set_algorithm_name(algo)
         meta.pair = name
-        for state in self.df_gen(pair):
-            assert state.shape[0] == 1
-
-            if is_trading:
-                end_price = self.roi_stoploss_backtest_check(meta, state, algo.roi, algo.stoploss)
-                if end_price:
-                    meta = self.sell_handling(meta, state, end_price)
-                    data_handler.update(vars(meta))
-                    meta.flush()
-                    meta.pair = name
-                    meta.order_type = 'MARKET'
-                    is_trading = False
-
-            algo.set_state(state)
-            action = algo.action(is_trading)
-
-            if action:
-                assert action in ['BUY', 'SELL']
-                if action == 'BUY':
-                    meta = self.buy_handling(meta, state, stake_amount)
-                    is_trading = True
-                else:
-                    meta.set_sell_reason('SELL SIGNAL')
-                    meta = self.sell_handling(meta, state)
-                    data_handler.update(vars(meta))
-                    meta.flush()
-                    meta.pair = name
-                    meta.order_type = 'MARKET'
-                    is_trading = False
+        profile = self.task_profile
+        exits, indicators, signals, records = [profile.phase(phase) for phase in ('exits', 'indicators', 'signals',
+                                                                                   'records')]
+        with profile.instrument(algo):
+            for state in profile.iterate('data_prep', self.df_gen(pair)):
+                assert state.shape[0] == 1
+
+                if is_trading:
+                    with exits:
+                        end_price = self.roi_stoploss_backtest_check(meta, state, algo.roi_schedule)
+                    if end_price:
+                        with records:
+                            meta = self.close_trade(collector, meta, state, name, end_price)
+                        is_trading = False
+
+                with indicators:
+                    algo.set_state(state)
+                with signals:
+                    action = algo.action(is_trading)
+
+                if action:
+                    assert action in ['BUY', 'SELL']
+                    with records:
+                        if action == 'BUY':
+                            meta = self.buy_handling(meta, state, stake_amount)
+                            is_trading = True
+                        else:
+                            meta.set_sell_reason('SELL SIGNAL')
+                            meta = self.close_trade(collector, meta, state, name)
+                            is_trading = False
 
         self.logger.info(self.algo_name(algo) + ' WAS TESTED ON ' + name)
+        return collector
+
+    def backtest_algo_pair_vectorized(self, algo: BasicAlgorithm, pair: pd.DataFrame, stake_amount: int,
+                                      name: str, signals: Tuple[np.ndarray, np.ndarray] = None) -> ResultCollector:
+        """
+        Produces the same trades as backtest_algo_pair, but indicators and signals are computed once
+        over the whole frame and exits are searched with array operations instead of bar by bar
+        :param signals: result of algo.signals(pair) if it is already known, e.g. shared by algorithms
+        that differ only in roi and stoploss
+        """
+        collector = ResultCollector()
+        if pair.empty:
+            self.logger.info(self.algo_name(algo) + ' WAS TESTED ON ' + name)
+            return collector
+
+        profile = self.task_profile
+        if signals is None:
+            with profile.instrument(algo), profile.phase('signals'):
+                signals = algo.signals(pair)
+        buy, sell = signals
+        with profile.phase('data_prep'):
+            close = pair['close'].to_numpy(dtype=float)
+            nanoseconds = index2nanoseconds(pair.index)
+        with profile.phase('exits'):
+            candidates = np.flatnonzero(buy)
+            entries, ends, end_prices, sell_reasons = list(), list(), list(), list()
+            i = 0
+            while True:
+                # trade is opened on the first BUY decision that is not earlier than i
+                k = np.searchsorted(candidates, i)
+                if k == candidates.shape[0]:
+                    break
+                entry = candidates[k]
+                found = algo.roi_schedule.first_exit(close[entry], nanoseconds[entry], nanoseconds[entry + 1:],
+                                                     close[entry + 1:], sell[entry + 1:], resolution=10 ** 9)
+                if found is None:
+                    break
+                end, end_price, sell_reason = found
+                end += entry + 1
+                entries.append(entry)
+                ends.append(end)
+                end_prices.append(end_price)
+                sell_reasons.append(sell_reason)
+                # ROI and STOPLOSS are checked before action, so a new trade may start on the same bar
+                i = end + 1 if sell_reason == 'SELL SIGNAL' else end
+
+        with profile.phase('records'):
+            # trades are built at once with the same arithmetic as buy_handling and sell_handling
+            entries, ends = np.array(entries, dtype=np.int64), np.array(ends, dtype=np.int64)
+            start_price, end_price = close[entries], np.array(end_prices, dtype=float)
+            quantity = stake_amount / start_price
+            trades = np.zeros(entries.shape[0], dtype=TRADE_DTYPE)
+            trades['start_time'] = index2stamps(pair.index)[entries].view('M8[ns]')
+            trades['duration'] = (nanoseconds[ends] - nanoseconds[entries]) // 10 ** 9
+            trades['start_price'] = start_price
+            trades['end_price'] = end_price
+            trades['quantity'] = quantity
+            trades['fee'] = stake_amount * self.commission + quantity * end_price * self.commission
+            trades['pair'] = name
+            trades['algorithm'] = type(algo).__name__
+            trades['sell_reason'] = sell_reasons
+            trades['order_type'] = 'MARKET'
+            collector.trades.extend(trades)
+
+        self.logger.info(self.algo_name(algo) + ' WAS TESTED ON ' + name)
+        return collector
+
+    def walk_forward_algo_pair(self, algo: BasicAlgorithm, pair: pd.DataFrame, stake_amount: int, name: str,
+                               windows: List[tuple]) -> List[Tuple[int, str, list]]:
+        """
+        Backtests the algorithm on in-sample and out-of-sample periods of every window. Indicators and signals
+        are computed once over the whole frame and sliced, so every period starts with warmed up indicators.
+        :return: number of the window, IN or OUT and trade sums of every period, see ResultCollector.totals
+        """
+        signals = algo.signals(pair) if not pair.empty else (np.zeros(0, dtype=bool), np.zeros(0, dtype=bool))
+        results = list()
+        for i, window in enumerate(windows):
+            for sample, start, end in (('IN', window[0], window[1]), ('OUT', window[1], window[2])):
+                lo, hi = pair.index.searchsorted(start), pair.index.searchsorted(end)
+                collector = self.backtest_algo_pair_vectorized(algo, pair.iloc[lo:hi], stake_amount, name,
+                                                               (signals[0][lo:hi], signals[1][lo:hi]))
+                results.append((i, sample, collector.totals()))
+        return results
+
+    def walk_forward(self, pairs: List[str], algorithms: List[BasicAlgorithm], days: int, in_sample_days: float,
+                     out_of_sample_days: float, step_days: float = None, override: bool = True,
+                     stake_amount: int = 10, load_workers: int = None, cache_bars: bool = True) -> pd.DataFrame:
+        """
+        Walk-forward evaluation: the loaded days are split into rolling windows of in-sample and out-of-sample
+        periods and every (algorithm, pair) is tested on all of them in one task. Lines of every period
+        are written to the WALK_FORWARD table of databases/walk_forward.db as tasks finish.
+        :param step_days: shift of every next window, out_of_sample_days by default
+        :return: lines of the table
+        """
+        self.logger = get_logger('backtest')
+        self.set_metadata(pairs, stake_amount, algorithms)
+        self.get_historical_data(pairs, days, override, load_workers, cache_bars)
+        self.logger.info('ALL DATA WAS DOWNLOADED AND PROCESSED TO NEEDED FORMAT')
+
+        frames = [frame for frames in self.tick_pair_frames.values() for frame in frames if not frame.empty]
+        start = min(frame.index[0] for frame in frames)
+        end = max(frame.index[-1] for frame in frames)
+        windows = walk_forward_windows(start, end, pd.Timedelta(days=in_sample_days),
+                                       pd.Timedelta(days=out_of_sample_days),
+                                       pd.Timedelta(days=step_days) if step_days is not None else None)
+        self.logger.info(str(len(windows)) + ' WALK-FORWARD WINDOWS FROM ' + str(start) + ' TO ' + str(end))
+
+        table = SummaryTable('walk_forward', 'WALK_FORWARD',
+                             {'window': 'INTEGER NOT NULL', 'sample': 'VARCHAR NOT NULL',
+                              'start_time': 'DATETIME NOT NULL', 'end_time': 'DATETIME NOT NULL',
+                              'pair': 'VARCHAR NOT NULL', 'algorithm': 'VARCHAR NOT NULL',
+                              'tick_type': 'VARCHAR NOT NULL'})
+        lines = list()
+        with SharedFrames() as shared:
+            tick_pair_frames = {tick_type: [shared.publish(pair) for pair in frames]
+                                for tick_type, frames in self.tick_pair_frames.items()}
+            initargs = (self.worker_copy(), worker_queue(self.logger.name))
+            with concurrent.futures.ProcessPoolExecutor(initializer=init_worker, initargs=initargs) as executor:
+                futures = dict()
+                for tick_type, frames in tick_pair_frames.items():
+                    for algo in self.tick2algo[tick_type]:
+                        for pair in frames:
+                            future = executor.submit(run_walk_forward_task, algo, pair, stake_amount, windows)
+                            futures[future] = (pair.name, self.algo_name(algo), tick_type)
+                for future in concurrent.futures.as_completed(futures):
+                    name, algo_name, tick_type = futures[future]
+                    for i, sample, sums in future.result():
+                        start_time, end_time = windows[i][:2] if sample == 'IN' else windows[i][1:]
+                        line = {'window': i, 'sample': sample, 'start_time': str(start_time),
+                                'end_time': str(end_time), 'pair': name, 'algorithm': algo_name,
+                                'tick_type': tick_type}
+                        lines.append(table.write(line, sums))
+        table.close()
+        self.logger.info('RESULTS OF ' + str(len(futures)) + ' WALK-FORWARD TASKS WERE SAVED')
+        return pd.DataFrame(lines)
 
     def backtest(self, pairs: List[str], algorithms: List[BasicAlgorithm], days: int = 3,
-                 override: bool = True, stake_amount: int = 10):
+                 override: bool = True, stake_amount: int = 10, vectorized: bool = False,
+                 load_workers: int = None, cache_bars: bool = True, storage: str = 'sqlite', profile: str = None):
+        """
+        :param storage: sqlite or columnar, see resultstore.open_store
+        :param profile: phases times data preparation, indicators, signals, exits, records and persistence
+        of every task, cprofile also saves cProfile stats of every task. Phases ranked over all tasks are
+        logged and kept in profile_report, files are saved to logging/backtest/profiles/<run>/
+        """
+        assert profile in [None, 'phases', 'cprofile']
         self.logger = get_logger('backtest')
         self.set_metadata(pairs, stake_amount, algorithms)
-        self.data_handler = DataHandler('backtest')
+        run = time.strftime('%Y%m%d-%H%M%S')
+        self.data_handler = open_store(storage, 'backtest', 'backtest', run)
         self.data_handler.drop_all_tables()
-        self.get_historical_data(pairs, days, override)
+        self.get_historical_data(pairs, days, override, load_workers, cache_bars)
         self.logger.info('ALL DATA WAS DOWNLOADED AND PROCESSED TO NEEDED FORMAT')
 
         # sqlite3.Connection is not picklable
         del self.data_handler
 
-        futures = list()
-        with concurrent.futures.ProcessPoolExecutor() as executor:
-            for tick_type in self.tick_pair_frames.keys():
-                for algo in self.tick2algo[tick_type]:
-                    for pair in self.tick_pair_frames[tick_type]:
-                        futures.append(executor.submit(self.backtest_algo_pair, algo, pair, stake_amount, pair.name))
-
-            for future in futures:
-                try:
-                    future.result()
-                except Exception as e:
-                    print(e)
+        results = list()
+        path = profile_path('backtest', run) if profile is not None else None
+        with SharedFrames() as shared:
+            # every frame is written once, tasks only carry its SharedFrame
+            tick_pair_frames = {tick_type: [shared.publish(pair) for pair in frames]
+                                for tick_type, frames in self.tick_pair_frames.items()}
+            futures = list()
+            initargs = (self.worker_copy(), worker_queue(self.logger.name))
+            with concurrent.futures.ProcessPoolExecutor(initializer=init_worker, initargs=initargs) as executor:
+                for tick_type in tick_pair_frames.keys():
+                    for algo in self.tick2algo[tick_type]:
+                        for pair in tick_pair_frames[tick_type]:
+                            futures.append(executor.submit(run_task, algo, pair, stake_amount, vectorized,
+                                                           profile, path))
+
+                for future in futures:
+                    try:
+                        results.append(future.result())
+                    except Exception as e:
+                        print(e)
+
+        # workers only collect trades, all of them are written here in one transaction
+        main = TaskProfile() if profile is not None else NULL_PROFILE
+        with main, main.phase('persistence'):
+            self.data_handler = open_store(storage, 'backtest', 'backtest', run)
+            trades = self.data_handler.merge(results)
+            self.logger.info('RESULTS OF ' + str(len(results)) + ' TASKS WERE SAVED')
+            self.data_handler.write_statistics(trades)
+            self.logger.info('STATISTICS OF ' + str(trades.shape[0]) + ' TRADES WERE SAVED')
+        if profile is not None:
+            self.profile_report = self.report_profile([result.profile for result in results] + [main.line()], path)
+
+    def report_profile(self, lines: List[dict], path: str) -> pd.DataFrame:
+        """
+        Saves timings of tasks and phases ranked over all of them, merges cProfile stats of tasks if there are any
+        :param lines: TaskProfile.line of every task and of the main process
+        """
+        ranked = report(lines)
+        pd.DataFrame(lines).to_csv(os.path.join(path, 'tasks.csv'), index=False)
+        ranked.to_csv(os.path.join(path, 'report.csv'))
+        wall = sum(line['wall'] for line in lines)
+        self.logger.info('PROFILE OF ' + str(len(lines) - 1) + ' TASKS, ' + '{:.2f}'.format(wall) + ' S\n'
+                         + ranked.to_string())
+        stats = sorted(glob.glob(os.path.join(path, '*.prof')))
+        if stats:
+            self.logger.info('CPROFILE OF ' + str(len(stats)) + ' TASKS\n'
+                             + merge_cprofile(stats, os.path.join(path, 'merged.pstats')))
+        return ranked
@@ -0,0 +1,129 @@
+import numpy as np
+import pandas as pd
+from typing import List, Union, NoReturn, Iterable
+
+from freqbot.tools import index2stamps, stamps2index
+
+
+class BarStore:
+    """
+    Fixed-capacity ring buffer of float64 columns with O(1) append.
+    Every row is written twice (at position p and p + capacity), so the last rows are always one contiguous slice
+    and frame/array return views instead of copies. Memory is allocated when the first columns arrive.
+    """
+    def __init__(self, capacity: int = 1000, columns: Iterable[str] = ()):
+        assert capacity > 0
+        self.capacity = capacity
+        self.columns: List[str] = list()
+        self.positions = dict()
+        self.values = np.full((2 * capacity, 0), np.nan)
+        self.times = None  # nanoseconds since epoch, only for stores indexed by time
+        self.tz = None
+        self.timed = False
+        self.size = 0
+        self.total = 0  # number of rows ever appended
+        self.add_columns(columns)
+
+    def __len__(self) -> int:
+        return self.size
+
+    @property
+    def empty(self) -> bool:
+        return self.size == 0
+
+    def add_columns(self, columns: Iterable[str]) -> NoReturn:
+        columns = [column for column in columns if column not in self.positions]
+        if not columns:
+            return
+        for column in columns:
+            self.positions[column] = len(self.columns)
+            self.columns.append(column)
+        values = np.full((2 * self.capacity, len(self.columns)), np.nan)
+        values[:, :self.values.shape[1]] = self.values
+        self.values = values
+
+    def window(self) -> slice:
+        end = (self.total - 1) % self.capacity + 1 + self.capacity if self.total else self.capacity
+        return slice(end - self.size, end)
+
+    def set_time(self, time: pd.Timestamp) -> int:
+        if not self.timed:
+            self.timed = True
+            self.tz = time.tz
+            self.times = np.zeros(2 * self.capacity, dtype=np.int64)
+        return time.value
+
+    def append(self, row: dict, time: pd.Timestamp = None) -> NoReturn:
+        """
+        :param row: column -> value, unknown columns are added to the store, missing ones are NaN
+        :param time: timestamp of the row for stores indexed by time
+        """
+        self.add_columns(row.keys())
+        position = self.total % self.capacity
+        line = np.full(len(self.columns), np.nan)
+        for column, value in row.items():
+            line[self.positions[column]] = value
+        self.values[position] = line
+        self.values[position + self.capacity] = line
+        if time is not None:
+            self.times[position] = self.times[position + self.capacity] = self.set_time(time)
+        self.total += 1
+        self.size = min(self.size + 1, self.capacity)
+
+    def extend(self, rows: Union[pd.DataFrame, List[dict]]) -> NoReturn:
+        """
+        Appends many rows at once, a DataFrame with DatetimeIndex makes the store indexed by time
+        """
+        if not isinstance(rows, pd.DataFrame):
+            rows = pd.DataFrame(list(rows))
+        if rows.empty:
+            return
+        self.add_columns(rows.columns)
+        timed = isinstance(rows.index, pd.DatetimeIndex)
+        n = rows.shape[0]
+        tail = rows.iloc[-self.capacity:]
+        line = np.full((tail.shape[0], len(self.columns)), np.nan)
+        for column in rows.columns:
+            line[:, self.positions[column]] = tail[column].to_numpy(dtype=float)
+        positions = np.arange(self.total + n - tail.shape[0], self.total + n) % self.capacity
+        self.values[positions] = self.values[positions + self.capacity] = line
+        if timed:
+            self.set_time(rows.index[0])
+            self.times[positions] = self.times[positions + self.capacity] = index2stamps(tail.index)
+        self.total += n
+        self.size = min(self.size + n, self.capacity)
+
+    def set_last(self, row: dict) -> NoReturn:
+        """
+        Overwrites columns of the newest row, e.g. indicators computed for it
+        """
+        assert self.size > 0
+        self.add_columns(row.keys())
+        position = (self.total - 1) % self.capacity
+        for column, value in row.items():
+            self.values[position, self.positions[column]] = value
+            self.values[position + self.capacity, self.positions[column]] = value
+
+    def discard(self, n: int) -> NoReturn:
+        """
+        Forgets the n oldest rows
+        """
+        self.size -= min(n, self.size)
+
+    def array(self, column: str) -> np.ndarray:
+        return self.values[self.window(), self.positions[column]]
+
+    def __getitem__(self, column: str) -> np.ndarray:
+        return self.array(column)
+
+    def index(self) -> pd.Index:
+        if self.timed:
+            return stamps2index(self.times[self.window()], self.tz)
+        return pd.RangeIndex(self.total - self.size, self.total)
+
+    def frame(self) -> pd.DataFrame:
+        """
+        :return: DataFrame over the stored rows without copying values,
+        indexed by time or by the number of the row since the store was created
+        """
+        return pd.DataFrame(self.values[self.window()], columns=self.columns, index=self.index(), copy=False)
@@ -0,0 +1,262 @@
+"""
+Offline benchmarks of the hot paths on synthetic aggTrade streams
+
+    python -m freqbot.benchmark --save baseline.json
+    python -m freqbot.benchmark --compare baseline.json
+"""
+import argparse
+import json
+import logging
+import platform
+import resource
+import time
+import numpy as np
+import pandas as pd
+from typing import List, Callable, NoReturn
+
+from freqbot import TradingBot, BacktestingBot, DataHandler
+from freqbot.algos import Quickie
+from freqbot.database import ResultCollector
+from freqbot.tools import ms2datetime
+from freqbot.records import TRADE_DTYPE
+from freqbot.resultstore import ColumnarStore
+from freqbot.statistics import TradeStatistics
+
+
+class OfflineClient:
+    """
+    Stands in for binance Client, benchmarks never send requests
+    """
+    def __getattr__(self, item):
+        raise AttributeError('benchmarks run offline, Client.' + item + ' is not available')
+
+
+def synthetic_trades(n: int, seed: int = 0, start: int = 1609452000000) -> pd.DataFrame:
+    """
+    :return: random walk of n aggregate trades in load_dataset format
+    """
+    rng = np.random.default_rng(seed)
+    data = pd.DataFrame()
+    data['id'] = np.arange(n)
+    data['price'] = 100 * np.exp(np.cumsum(rng.normal(0, 0.002, n)))
+    data['amount'] = rng.exponential(1, n)
+    data['timestamp'] = start + np.cumsum(rng.integers(50, 3000, n))
+    data['datetime'] = ms2datetime(data['timestamp'])
+    data['cost'] = data['price'] * data['amount']
+    return data
+
+
+def synthetic_messages(trades: pd.DataFrame, pair: str = 'BTCUSDT') -> List[dict]:
+    """
+    :return: trades as aggTrade messages of the websocket
+    """
+    return [{'e': 'aggTrade', 'E': row.timestamp, 's': pair, 'a': row.id, 'p': '{:.8f}'.format(row.price),
+             'q': '{:.8f}'.format(row.amount), 'f': row.id, 'l': row.id, 'T': row.timestamp, 'm': False, 'M': True}
+            for row in trades.itertuples(index=False)]
+
+
+def synthetic_trade(rng: np.random.Generator, pair: str, algorithm: str) -> dict:
+    """
+    :return: closed trade as vars(OrderMetadata)
+    """
+    start_price = 100 * (1 + rng.normal(0, 0.01))
+    end_price = start_price * (1 + rng.normal(0, 0.01))
+    return {'quantity': 10 / start_price, 'start_price': start_price, 'end_price': end_price, 'pair': pair,
+            'ctime': time.ctime(), 'open_time': int(time.time() * 1000), 'start_time': 0,
+            'end_time': float(rng.integers(60, 3600)), 'sell_reason': 'ROI', 'fee': 0.015, 'order_type': 'MARKET',
+            'limit_type': None, 'algorithm_name': algorithm}
+
+
+def synthetic_trade_array(n: int, pairs: int = 40, algorithms: int = 5, seed: int = 0) -> np.ndarray:
+    """
+    :return: n closed trades in blocks of one (pair, algorithm), as a backtest returns them
+    """
+    rng = np.random.default_rng(seed)
+    trades = np.zeros(n, dtype=TRADE_DTYPE)
+    size = -(-n // (pairs * algorithms))
+    block = np.arange(n) // size
+    trades['start_time'] = (1609452000000 + np.arange(n) % size * 60000).view('M8[ms]')
+    trades['duration'] = rng.integers(60, 3600, n)
+    trades['start_price'] = 100 * (1 + rng.normal(0, 0.01, n))
+    trades['end_price'] = trades['start_price'] * (1 + rng.normal(0, 0.01, n))
+    trades['quantity'] = 10 / trades['start_price']
+    trades['fee'] = 0.015
+    trades['pair'] = np.char.add('PAIR', (block % pairs).astype(str))
+    trades['algorithm'] = np.char.add('ALGO', (block // pairs).astype(str))
+    trades['sell_reason'] = 'ROI'
+    trades['order_type'] = 'MARKET'
+    return trades
+
+
+def timed(function: Callable, *args) -> float:
+    start = time.perf_counter()
+    function(*args)
+    return time.perf_counter() - start
+
+
+def latencies(samples: List[int]) -> dict:
+    """
+    :param samples: durations in ns
+    """
+    samples = np.array(samples) / 1000
+    return {'p50_us': float(np.percentile(samples, 50)), 'p99_us': float(np.percentile(samples, 99)),
+            'mean_us': float(samples.mean())}
+
+
+def peak_rss_mb() -> float:
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def make_bot(bot_class=BacktestingBot) -> TradingBot:
+    bot = bot_class('', '', client=OfflineClient())
+    bot.logger = logging.getLogger('benchmark')
+    return bot
+
+
+def bench_bars(trades: pd.DataFrame, tick_types: List[str]) -> dict:
+    bot = make_bot()
+    bot.tick_pair_frames = {tick_type: list() for tick_type in tick_types}
+    seconds = timed(bot.update_tick_pair_frames, trades, 'BENCH')
+    bars = sum(frames[0].shape[0] for frames in bot.tick_pair_frames.values())
+    return {'seconds': seconds, 'trades_per_s': trades.shape[0] * len(tick_types) / seconds,
+            'bars_per_s': bars / seconds}
+
+
+def bench_indicators(bars: pd.DataFrame) -> dict:
+    algo = Quickie('TB', 0)
+    full = timed(algo.update_indicators, bars.reset_index(drop=True))
+    algo.reset_indicators()
+    records = bars.to_dict('records')
+    incremental = timed(lambda: [algo.next_indicators(bar) for bar in records])
+    return {'full_seconds': full, 'full_bars_per_s': bars.shape[0] / full,
+            'incremental_bars_per_s': bars.shape[0] / incremental}
+
+
+def bench_backtest(bars: pd.DataFrame, loop_bars: int) -> dict:
+    bot = make_bot()
+    results = dict()
+    for name, frame, backtest in (('loop', bars.iloc[:loop_bars], bot.backtest_algo_pair),
+                                  ('vectorized', bars, bot.backtest_algo_pair_vectorized)):
+        algo = Quickie('TB', 0)
+        bot.set_metadata(['BENCH'], 10, [algo])
+        seconds = timed(backtest, algo, frame, 10, 'BENCH')
+        results[name + '_bars_per_s'] = frame.shape[0] / seconds
+    return results
+
+
+def bench_live(history: pd.DataFrame, messages: List[dict], tick_size: int) -> dict:
+    bot = make_bot(TradingBot)
+    bot.algorithm = Quickie('TB', tick_size)
+    bot.set_history(history)
+    samples = list()
+    start = time.perf_counter()
+    for message in messages:
+        t = time.perf_counter_ns()
+        bot.update(bot.process_message(dict(message)), False)
+        samples.append(time.perf_counter_ns() - t)
+    seconds = time.perf_counter() - start
+    return dict(latencies(samples), messages_per_s=len(messages) / seconds)
+
+
+def bench_database(n_plain: int, n_buffered: int) -> dict:
+    rng = np.random.default_rng(0)
+    results = dict()
+    for name, n, kwargs in (('plain', n_plain, dict()), ('buffered', n_buffered, {'buffered': True})):
+        trades = [synthetic_trade(rng, 'PAIR' + str(i % 40), 'ALGO' + str(i % 3)) for i in range(n)]
+        data_handler = DataHandler('benchmark', **kwargs)
+        data_handler.drop_all_tables()
+        start = time.perf_counter()
+        for trade in trades:
+            data_handler.update(trade)
+        data_handler.close()
+        results[name + '_trades_per_s'] = n / (time.perf_counter() - start)
+
+    trades = [synthetic_trade(rng, 'PAIR' + str(i % 40), 'ALGO' + str(i % 3)) for i in range(n_buffered)]
+    data_handler = DataHandler('benchmark', profile='backtest')
+    data_handler.drop_all_tables()
+    start = time.perf_counter()
+    collector = ResultCollector()
+    for trade in trades:
+        collector.update(trade)
+    data_handler.merge([collector])
+    data_handler.close()
+    results['merged_trades_per_s'] = n_buffered / (time.perf_counter() - start)
+
+    # trades that are already a structured array, as the vectorized backtest produces them
+    data_handler = DataHandler('benchmark', profile='backtest')
+    data_handler.drop_all_tables()
+    start = time.perf_counter()
+    data_handler.insert_trades(collector.array())
+    data_handler.close()
+    results['array_trades_per_s'] = n_buffered / (time.perf_counter() - start)
+
+    store = ColumnarStore('benchmark', run='benchmark', profile='backtest')
+    store.drop_all_tables()
+    start = time.perf_counter()
+    store.insert_trades(collector.array())
+    store.close()
+    results['columnar_trades_per_s'] = n_buffered / (time.perf_counter() - start)
+    store.drop_all_tables()
+    return results
+
+
+def bench_statistics(n: int) -> dict:
+    trades = synthetic_trade_array(n)
+    start = time.perf_counter()
+    TradeStatistics(trades).summary()
+    seconds = time.perf_counter() - start
+    return {'summary_seconds': seconds, 'trades_per_s': n / seconds}
+
+
+def run(n_trades: int = 200000, tick_size: int = 20, live_messages: int = 2000, loop_bars: int = 2000,
+        db_plain: int = 300, db_buffered: int = 20000, statistics_trades: int = 1000000) -> dict:
+    trades = synthetic_trades(n_trades)
+    bars = trades.bars.TB(tick_size)
+    results = dict()
+    results['bars'] = bench_bars(trades, ['TB_' + str(tick_size), 'VB_500', 'DB_50000'])
+    results['indicators'] = bench_indicators(bars)
+    results['backtest'] = bench_backtest(bars, loop_bars)
+    history, live = trades.iloc[:-live_messages], trades.iloc[-live_messages:]
+    results['live'] = bench_live(history, synthetic_messages(live), tick_size)
+    results['database'] = bench_database(db_plain, db_buffered)
+    results['statistics'] = bench_statistics(statistics_trades)
+    return {'meta': {'time': time.ctime(), 'python': platform.python_version(), 'numpy': np.__version__,
+                     'pandas': pd.__version__, 'trades': n_trades, 'bars': bars.shape[0],
+                     'peak_rss_mb': peak_rss_mb()},
+            'results': results}
+
+
+def compare(report: dict, baseline: dict) -> NoReturn:
+    for group, metrics in report['results'].items():
+        for metric, value in metrics.items():
+            old = baseline['results'].get(group, dict()).get(metric)
+            line = '{:<12} {:<26} {:>14.2f}'.format(group, metric, value)
+            if old:
+                line += '  {:>14.2f}  x{:.2f}'.format(old, value / old)
+            print(line)
+
+
+def main() -> NoReturn:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--trades', type=int, default=200000)
+    parser.add_argument('--tick-size', type=int, default=20)
+    parser.add_argument('--live-messages', type=int, default=2000)
+    parser.add_argument('--loop-bars', type=int, default=2000)
+    parser.add_argument('--save', help='write the report to this JSON file')
+    parser.add_argument('--compare', help='JSON report of an earlier run to compare with')
+    args = parser.parse_args()
+
+    report = run(args.trades, args.tick_size, args.live_messages, args.loop_bars)
+    baseline = dict(results=dict())
+    if args.compare:
+        with open(args.compare) as fh:
+            baseline = json.load(fh)
+    compare(report, baseline)
+    print('peak RSS {:.1f} MB'.format(report['meta']['peak_rss_mb']))
+    if args.save:
+        with open(args.save, 'w') as fh:
+            json.dump(report, fh, indent=2)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,47 @@
+import pandas as pd
+import glob
+import os
+from typing import Union, NoReturn
+
+from freqbot.shared import save_frame, load_frame
+
+
+class BarCache:
+    """
+    Bars saved in historical_data/bars/ as memory-mappable .npy files. An entry is keyed by pair, tick type,
+    tick size and the range of raw trades it was built from, so changed raw data never hits a stale entry.
+    """
+    def __init__(self, path: str):
+        self.path = os.path.join(path, 'bars')
+        os.makedirs(self.path, exist_ok=True)
+
+    @staticmethod
+    def source_key(new_data: pd.DataFrame) -> str:
+        """
+        :param new_data: raw trades the bars are built from
+        :return: number of trades with first and last aggregate trade id
+        """
+        if new_data.empty:
+            return '0'
+        return '_'.join(str(int(value)) for value in (new_data.shape[0], new_data['id'].iloc[0],
+                                                       new_data['id'].iloc[-1]))
+
+    def entry(self, pair: str, tick_type: str, source: str) -> str:
+        """
+        :param tick_type: tick type and tick size joined with '_', as BacktestingBot names them
+        """
+        return os.path.join(self.path, pair + '_' + tick_type + '__' + source)
+
+    def load(self, pair: str, tick_type: str, source: str) -> Union[pd.DataFrame, None]:
+        entry = self.entry(pair, tick_type, source)
+        if not os.path.exists(entry + '.json'):
+            return None
+        return load_frame(entry)
+
+    def save(self, pair: str, tick_type: str, source: str, frame: pd.DataFrame) -> NoReturn:
+        self.invalidate(pair, tick_type)
+        save_frame(frame, self.entry(pair, tick_type, source))
+
+    def invalidate(self, pair: str, tick_type: str) -> NoReturn:
+        for filename in glob.glob(glob.escape(self.entry(pair, tick_type, '')) + '*'):
+            os.remove(filename)
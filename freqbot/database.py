@@ -1,31 +1,171 @@
 import sqlite3
 import os
+import atexit
+import numpy as np
+import pandas as pd
 from numpy import heaviside, maximum
-from typing import Union, NoReturn
+from typing import Union, NoReturn, List
 import time
 
-from freqbot.tools import r
+from freqbot.tools import r, ctime2stamp
+from freqbot.records import TRADE_DTYPE, TradeArray, main_lines
+from freqbot.statistics import STATISTICS_COLUMNS, TradeStatistics, trade_sums
 
 
-class DataHandler:
-    def __init__(self, filename):
-        self.connection = self.connect(filename)
+class StorageProfile:
+    """
+    SQLite pragmas of a database connection
+    """
+    def __init__(self, journal_mode: str = 'WAL', synchronous: str = 'FULL', cache_size: int = -2000,
+                 mmap_size: int = 0, temp_store: str = 'DEFAULT'):
+        """
+        :param cache_size: pages, or KiB if negative
+        :param mmap_size: bytes of the database file that are read through memory mapping
+        """
+        self.pragmas = {'journal_mode': journal_mode, 'synchronous': synchronous, 'cache_size': cache_size,
+                        'mmap_size': mmap_size, 'temp_store': temp_store}
+
+    def apply(self, connection: sqlite3.Connection) -> NoReturn:
+        for name, value in self.pragmas.items():
+            connection.execute('PRAGMA ' + name + '=' + str(value))
+
+
+# live results must survive a crash of the bot or of the machine, WAL lets reports read while the bot writes;
+# backtest results are rebuilt by running the backtest again, so nothing is synced to disk
+PROFILES = {'live': StorageProfile(journal_mode='WAL', synchronous='FULL', cache_size=-8000),
+            'backtest': StorageProfile(journal_mode='MEMORY', synchronous='OFF', cache_size=-64000,
+                                       mmap_size=256 * 2 ** 20, temp_store='MEMORY')}
+
+
+class ResultStore:
+    """
+    Where results of trades are written: DataHandler keeps them in SQLite tables, ColumnarStore (see resultstore)
+    in append-only .npy files. Live trades come one by one with update, backtests write arrays of TRADE_DTYPE.
+    """
+    def update(self, metadata) -> NoReturn:
+        """
+        :param metadata: vars(OrderMetadata) or TradeRecord of a closed trade
+        """
+        raise NotImplementedError
+
+    def insert_trades(self, trades: np.ndarray) -> NoReturn:
+        raise NotImplementedError
+
+    def merge(self, collectors: List['ResultCollector']) -> np.ndarray:
+        """
+        Writes trades collected by worker processes at once
+        :return: all merged trades
+        """
+        trades = np.concatenate([collector.array() for collector in collectors]) if collectors else \
+            np.zeros(0, dtype=TRADE_DTYPE)
+        self.insert_trades(trades)
+        return trades
+
+    def write_statistics(self, trades: np.ndarray) -> NoReturn:
+        """
+        Replaces saved statistics with statistics of the trades, see TradeStatistics.summary
+        """
+        raise NotImplementedError
+
+    def select_trades(self, pair: str, algorithm: str, start_time: int = None, end_time: int = None) -> pd.DataFrame:
+        """
+        :param start_time: ms since epoch, trades that started earlier are skipped
+        :param end_time: ms since epoch, trades that started at it or later are skipped
+        :return: MAIN lines of the pair and algorithm ordered by start_time
+        """
+        raise NotImplementedError
+
+    def statistics(self) -> pd.DataFrame:
+        """
+        :return: lines saved by write_statistics
+        """
+        raise NotImplementedError
+
+    def flush(self) -> NoReturn:
+        pass
+
+    def drop_all_tables(self) -> NoReturn:
+        raise NotImplementedError
+
+    def close(self) -> NoReturn:
+        raise NotImplementedError
+
+
+class DataHandler(ResultStore):
+    main_columns = ('start_time', 'duration', 'start_price', 'end_price', 'ratio', 'sell_reason', 'income', 'fee',
+                    'pair', 'algorithm', 'stake_amount', 'order_type', 'limit_type')
+    pair_columns = ('pair', 'num_loss', 'num_profit', 'num_total', 'ratio_num', 'loss', 'profit', 'ratio', 'total',
+                    'av_duration')
+    algo_columns = ('algo', ) + pair_columns[1:]
+
+    def __init__(self, filename, buffered: bool = False, flush_size: int = 1000, flush_interval: float = None,
+                 profile: Union[str, StorageProfile] = 'live'):
+        """
+        :param filename: name of the database in databases/
+        :param buffered: keep trades and PAIR/ALGO lines in memory and write them in one transaction per flush
+        :param flush_size: number of buffered trades that triggers a flush
+        :param flush_interval: seconds after the last flush that trigger a flush on the next update
+        :param profile: StorageProfile or name of one of PROFILES, live is durable and backtest is fast
+        """
+        self.connection = self.connect(filename, profile)
         self.connection.row_factory = sqlite3.Row
         self.cursor = self.connection.cursor()
         self.create_tables()
 
+        self.buffered = buffered
+        self.flush_size = flush_size
+        self.flush_interval = flush_interval
+        self.last_flush = time.monotonic()
+        self.main_buffer = list()
+        self.lines = {'PAIR': dict(), 'ALGO': dict()}   # cached PAIR/ALGO lines
+        self.dirty = {'PAIR': set(), 'ALGO': set()}     # keys of lines changed since the last flush
+        if buffered:
+            atexit.register(self.close)
+
     @staticmethod
-    def connect(filename: str) -> sqlite3.Connection:
+    def connect(filename: str, profile: Union[str, StorageProfile] = 'live') -> sqlite3.Connection:
         path = os.path.abspath(__file__)
         path = "/".join(path.split('/')[:-2]) + '/databases/'
-        return sqlite3.connect(path + filename + '.db', check_same_thread=False)
+        connection = sqlite3.connect(path + filename + '.db', check_same_thread=False)
+        (PROFILES[profile] if isinstance(profile, str) else profile).apply(connection)
+        return connection
+
+    def old_main(self) -> Union[tuple, None]:
+        """
+        MAIN of databases written before start_time became ms since epoch has a DATETIME start_time
+        of time.ctime strings in local time, they are converted to ms here
+        :return: columns and converted rows of an old MAIN, None if MAIN is missing or up to date
+        """
+        types = {row[1]: row[2] for row in self.connection.execute('PRAGMA table_info(MAIN)')}
+        if types.get('start_time', 'INTEGER').upper() == 'INTEGER':
+            return None
+        cursor = self.connection.execute('SELECT * FROM MAIN ORDER BY id')
+        columns = [description[0] for description in cursor.description]
+        position = columns.index('start_time')
+        rows = list()
+        for row in cursor:
+            row = list(row)
+            value = row[position]
+            try:
+                row[position] = int(value) if isinstance(value, (int, float)) else ctime2stamp(value)
+            except (TypeError, ValueError):
+                raise ValueError('MAIN.start_time ' + repr(value) + ' of trade ' + str(row[0])
+                                 + ' is neither ms since epoch nor a time.ctime string, MAIN can not be migrated')
+            rows.append(row)
+        return columns, rows
 
     def create_tables(self) -> NoReturn:
+        old = self.old_main()
         with self.connection:
+            if old is not None:
+                # MAIN is rebuilt with INTEGER start_time in one transaction
+                self.connection.execute('BEGIN')
+                self.connection.execute('DROP INDEX IF EXISTS MAIN_PAIR_ALGORITHM_START_TIME')
+                self.connection.execute('DROP TABLE MAIN')
             self.connection.execute("""
                 CREATE TABLE IF NOT EXISTS MAIN (
                     id INTEGER NOT NULL PRIMARY KEY AUTOINCREMENT,
-                    start_time DATETIME NOT NULL,
+                    start_time INTEGER NOT NULL,
                     duration INTEGER NOT NULL,
                     start_price REAL NOT NULL,
                     end_price REAL NOT NULL,
@@ -40,6 +180,13 @@ class DataHandler:
                     limit_type VARCHAR
                 );
             """)
+            # start_time is ms since epoch, so time ranges of a pair and algorithm are read from the index
+            self.connection.execute("""
+                CREATE INDEX IF NOT EXISTS MAIN_PAIR_ALGORITHM_START_TIME ON MAIN (pair, algorithm, start_time);
+            """)
+            if old is not None:
+                columns, rows = old
+                self.connection.executemany(self.insert_sql('MAIN', columns), rows)
             self.connection.execute("""
                 CREATE TABLE IF NOT EXISTS PAIR (
                     pair VARCHAR NOT NULL PRIMARY KEY,
@@ -68,20 +215,45 @@ class DataHandler:
                     av_duration REAL
                 );
             """)
+            self.connection.execute("""
+                CREATE TABLE IF NOT EXISTS STATISTICS (
+                    pair VARCHAR NOT NULL,
+                    algo VARCHAR NOT NULL,
+                    num_loss INTEGER NOT NULL,
+                    num_profit INTEGER NOT NULL,
+                    num_total INTEGER NOT NULL,
+                    ratio_num REAL,
+                    loss REAL NOT NULL,
+                    profit REAL NOT NULL,
+                    ratio REAL,
+                    total REAL NOT NULL,
+                    av_duration REAL,
+                    profit_factor REAL,
+                    max_drawdown REAL NOT NULL,
+                    sharpe REAL,
+                    sortino REAL,
+                    exposure REAL,
+                    PRIMARY KEY (pair, algo)
+                );
+            """)
 
-    def get_income(self, metadata: dict) -> float:
+    @staticmethod
+    def get_income(metadata: dict) -> float:
         income = (metadata['end_price'] - metadata['start_price']) * metadata['quantity']
         income -= metadata['fee']
         return income
 
-    def get_duration(self,  metadata) -> float:
+    @staticmethod
+    def get_duration(metadata) -> float:
         return (metadata['end_time'] - metadata['start_time']) / 60
 
     def get_av_duration(self, old_data, new_data, num_total) -> float:
         return ((num_total - 1) * old_data['av_duration'] + self.get_duration(new_data)) / num_total
 
-    def get_pair_algo_line(self, key: str, table) -> Union[sqlite3.Row, bool]:
+    def get_pair_algo_line(self, key: str, table) -> Union[sqlite3.Row, dict, bool]:
         assert table in ['PAIR', 'ALGO']
+        if key in self.lines[table]:
+            return self.lines[table][key]
         if table == 'PAIR':
             self.cursor.execute('SELECT * FROM PAIR WHERE pair=?', (key, ))
         else:
@@ -93,15 +265,16 @@ class DataHandler:
         else:
             return False
 
-    def get_main_data(self, metadata: dict) -> tuple:
+    @staticmethod
+    def get_main_data(metadata: dict) -> tuple:
         main_data = list()
-        main_data.append(metadata['ctime'])                                              # start_time
-        main_data.append(r(self.get_duration(metadata)))                                 # duration
+        main_data.append(metadata['open_time'])                                          # start_time
+        main_data.append(r(DataHandler.get_duration(metadata)))                          # duration
         main_data.append(r(metadata['start_price']))                                     # start_price
         main_data.append(r(metadata['end_price']))                                       # end_price
         main_data.append(r(metadata['end_price'] / metadata['start_price']))             # ratio
         main_data.append(metadata['sell_reason'])                                        # sell_reason
-        main_data.append(r(self.get_income(metadata), 6))                                # income
+        main_data.append(r(DataHandler.get_income(metadata), 6))                         # income
         main_data.append(r(metadata['fee'], 6))                                          # fee
         main_data.append(metadata['pair'])                                               # pair
         main_data.append(metadata['algorithm_name'])                                     # algorithm
@@ -188,11 +361,105 @@ class DataHandler:
         end_time, sell_cause
         :return: trade function has no return but it updates tables
         """
+        if self.buffered:
+            self.buffer(metadata)
+            return
         self.update_main(metadata)
         self.update_pair(metadata)
         self.update_algo(metadata)
 
+    def buffer(self, metadata: dict) -> NoReturn:
+        self.main_buffer.append(self.get_main_data(metadata))
+        for table, key, columns in (('PAIR', metadata['pair'], self.pair_columns),
+                                    ('ALGO', metadata['algorithm_name'], self.algo_columns)):
+            self.lines[table][key] = dict(zip(columns, self.get_pair_algo_data(metadata, table)))
+            self.dirty[table].add(key)
+        if len(self.main_buffer) >= self.flush_size or \
+                (self.flush_interval is not None and time.monotonic() - self.last_flush >= self.flush_interval):
+            self.flush()
+
+    def flush(self) -> NoReturn:
+        """
+        Writes buffered trades to MAIN and changed PAIR/ALGO lines in a single transaction
+        """
+        self.last_flush = time.monotonic()
+        if not self.main_buffer and not self.dirty['PAIR'] and not self.dirty['ALGO']:
+            return
+        with self.connection:
+            self.connection.executemany(self.insert_sql('MAIN', self.main_columns), self.main_buffer)
+            for table, columns in (('PAIR', self.pair_columns), ('ALGO', self.algo_columns)):
+                lines = [tuple(self.lines[table][key][column] for column in columns) for key in self.dirty[table]]
+                self.connection.executemany(self.insert_sql(table, columns, 'REPLACE'), lines)
+        self.main_buffer = list()
+        self.dirty = {'PAIR': set(), 'ALGO': set()}
+
+    @staticmethod
+    def insert_sql(table: str, columns: tuple, command: str = 'INSERT') -> str:
+        return command + ' INTO ' + table + ' (' + ', '.join(columns) + ') values (' + \
+            ', '.join('?' * len(columns)) + ')'
+
+    def close(self) -> NoReturn:
+        if self.connection is None:
+            return
+        if self.buffered:
+            self.flush()
+            atexit.unregister(self.close)
+        self.connection.close()
+        self.connection = None
+
+    def get_merged_line(self, key: str, table: str, sums: list) -> tuple:
+        """
+        :param sums: num_loss, num_profit, loss, profit and total duration of new trades
+        :return: PAIR/ALGO line with new trades added to the line that is already in the table
+        """
+        num_loss, num_profit, loss, profit, duration = sums
+        old_data = self.get_pair_algo_line(key, table)
+        if old_data:
+            num_loss += old_data['num_loss']
+            num_profit += old_data['num_profit']
+            loss += old_data['loss']
+            profit += old_data['profit']
+            duration += old_data['av_duration'] * old_data['num_total']
+        num_total = num_loss + num_profit
+        return (key, num_loss, num_profit, num_total, r(num_profit / num_total), r(loss, 6), r(profit, 6),
+                r(profit / (loss + profit)), r(profit - loss), r(duration / num_total))
+
+    def insert_trades(self, trades: np.ndarray) -> NoReturn:
+        """
+        Bulk insert of an array of TRADE_DTYPE: MAIN lines and PAIR/ALGO lines updated with sums of the trades
+        are written in a single transaction
+        """
+        self.flush()
+        with self.connection:
+            self.connection.executemany(self.insert_sql('MAIN', self.main_columns), main_lines(trades))
+            for table, columns, key in (('PAIR', self.pair_columns, 'pair'), ('ALGO', self.algo_columns, 'algorithm')):
+                lines = [self.get_merged_line(name, table, values) for name, values in trade_sums(trades, key).items()]
+                self.connection.executemany(self.insert_sql(table, columns, 'REPLACE'), lines)
+        self.lines = {'PAIR': dict(), 'ALGO': dict()}
+
+    def select_trades(self, pair: str, algorithm: str, start_time: int = None, end_time: int = None) -> pd.DataFrame:
+        self.flush()
+        sql = 'SELECT ' + ', '.join(self.main_columns) + ' FROM MAIN ' \
+              'WHERE pair=? AND algorithm=? AND start_time>=? AND start_time<? ORDER BY start_time'
+        return pd.read_sql_query(sql, self.connection, params=(
+            pair, algorithm, start_time if start_time is not None else -2 ** 63,
+            end_time if end_time is not None else 2 ** 63 - 1))
+
+    def statistics(self) -> pd.DataFrame:
+        return pd.read_sql_query('SELECT * FROM STATISTICS', self.connection)
+
+    def write_statistics(self, trades: np.ndarray) -> NoReturn:
+        summary = TradeStatistics(trades).summary()
+        columns = ('pair', 'algo') + STATISTICS_COLUMNS
+        lines = list(zip(*(summary[column].tolist() for column in columns)))
+        with self.connection:
+            self.connection.execute('DELETE FROM STATISTICS')
+            self.connection.executemany(self.insert_sql('STATISTICS', columns), lines)
+
     def drop_all_tables(self) -> NoReturn:
+        self.main_buffer = list()
+        self.lines = {'PAIR': dict(), 'ALGO': dict()}
+        self.dirty = {'PAIR': set(), 'ALGO': set()}
         with self.connection:
             self.connection.execute("""
             DROP TABLE IF EXISTS MAIN""")
@@ -200,17 +467,103 @@ class DataHandler:
             DROP TABLE IF EXISTS PAIR""")
             self.connection.execute("""
             DROP TABLE IF EXISTS ALGO""")
+            self.connection.execute("""
+            DROP TABLE IF EXISTS STATISTICS""")
 
         self.create_tables()
 
 
+class ResultCollector:
+    """
+    Keeps trades of one backtest task in memory as one structured array, so worker processes never touch
+    the database and the parent writes everything with DataHandler.merge
+    """
+    def __init__(self):
+        self.trades = TradeArray()
+        self.profile = None  # TaskProfile.line of the task if the backtest is profiled
+
+    def update(self, metadata) -> NoReturn:
+        """
+        :param metadata: vars(OrderMetadata) or TradeRecord
+        """
+        self.trades.append_metadata(metadata)
+
+    def array(self) -> np.ndarray:
+        return self.trades.array()
+
+    @property
+    def sums(self) -> dict:
+        """
+        :return: num_loss, num_profit, loss, profit and total duration by pair and by algorithm
+        """
+        trades = self.array()
+        return {'PAIR': trade_sums(trades, 'pair'), 'ALGO': trade_sums(trades, 'algorithm')}
+
+    def totals(self) -> list:
+        """
+        :return: num_loss, num_profit, loss, profit and total duration of all collected trades
+        """
+        return [sum(values) for values in zip(*self.sums['PAIR'].values())] or [0] * 5
+
+
+class SummaryTable:
+    """
+    Table with a line of trade sums per key (sweep candidate, walk-forward window, ...),
+    every line is written as soon as it is known
+    """
+    summary_columns = {'num_loss': 'INTEGER NOT NULL', 'num_profit': 'INTEGER NOT NULL',
+                       'num_total': 'INTEGER NOT NULL', 'loss': 'REAL NOT NULL', 'profit': 'REAL NOT NULL',
+                       'ratio': 'REAL', 'total': 'REAL NOT NULL', 'av_duration': 'REAL'}
+
+    def __init__(self, filename: str, table: str, key_columns: dict, profile: Union[str, StorageProfile] = 'backtest'):
+        """
+        :param filename: name of the database in databases/, the table is created anew
+        :param key_columns: names and SQL types of the columns before the sums
+        :param profile: see DataHandler
+        """
+        self.table = table
+        columns = dict(key_columns, **self.summary_columns)
+        self.columns = tuple(columns)
+        self.connection = DataHandler.connect(filename, profile)
+        with self.connection:
+            self.connection.execute('DROP TABLE IF EXISTS ' + table)
+            self.connection.execute('CREATE TABLE ' + table + ' (' +
+                                    ', '.join(name + ' ' + sql_type for name, sql_type in columns.items()) + ')')
+
+    @staticmethod
+    def summary(sums: list) -> dict:
+        """
+        :param sums: num_loss, num_profit, loss, profit and total duration of trades
+        """
+        num_loss, num_profit, loss, profit, duration = sums
+        num_total = int(num_loss + num_profit)
+        return {'num_loss': int(num_loss), 'num_profit': int(num_profit), 'num_total': num_total,
+                'loss': r(loss, 6), 'profit': r(profit, 6),
+                'ratio': r(profit / (loss + profit)) if loss + profit else None,
+                'total': r(profit - loss), 'av_duration': r(duration / num_total) if num_total else None}
+
+    def write(self, line: dict, sums: list) -> dict:
+        """
+        :param line: values of the key columns
+        :return: the written line with sums
+        """
+        line = dict(line, **self.summary(sums))
+        with self.connection:
+            self.connection.execute(DataHandler.insert_sql(self.table, self.columns, 'REPLACE'),
+                                    tuple(line[column] for column in self.columns))
+        return line
+
+    def close(self) -> NoReturn:
+        self.connection.close()
+
+
 if __name__ == '__main__':
     dh = DataHandler('trade')
     # dh.drop_table()
 
     # order = fb.OrderMetadata()
     order = {'quantity': 300, 'start_price': 8.5, 'end_price': 9,
-             'pair': "LOLKUK", 'start_time': 1234, 'end_time': 2100,
+             'pair': "LOLKUK", 'open_time': int(time.time() * 1000), 'start_time': 1234, 'end_time': 2100,
              'sell_reason': 'SELL SIGNAL', 'fee': 0.1, 'order_type': "MARKET",
              'limit_type': None, 'algorithm_name': "MUMBA_v4"}
 
@@ -0,0 +1,227 @@
+import asyncio
+import functools
+import logging
+import threading
+import time
+import sys
+from typing import Dict, List, NoReturn
+
+from binance.websockets import BinanceSocketManager
+from binance.client import Client
+
+from freqbot.tradingbot import TradingBot
+from freqbot.simulation import SimulatedSocketManager
+from freqbot.database import DataHandler
+from freqbot.records import TradeRecord
+from freqbot.algos import BasicAlgorithm
+from freqbot.logging import get_logger
+
+
+class MeteredQueue(asyncio.Queue):
+    """
+    Bounded queue that counts how often and how long producers waited for space in it
+    """
+    def __init__(self, name: str, maxsize: int):
+        super().__init__(maxsize)
+        self.name = name
+        self.puts = 0
+        self.blocked = 0
+        self.wait_seconds = 0.
+        self.max_depth = 0
+
+    async def put(self, item) -> NoReturn:
+        if self.full():
+            self.blocked += 1
+            start = time.perf_counter()
+            await super().put(item)
+            self.wait_seconds += time.perf_counter() - start
+        else:
+            self.put_nowait(item)
+        self.puts += 1
+        self.max_depth = max(self.max_depth, self.qsize())
+
+    def metrics(self) -> dict:
+        return {'depth': self.qsize(), 'maxsize': self.maxsize, 'max_depth': self.max_depth, 'puts': self.puts,
+                'blocked': self.blocked, 'wait_seconds': self.wait_seconds}
+
+
+class AsyncTradingBot(TradingBot):
+    """
+    TradingBot whose live part runs on asyncio. Trades, bars, orders, execution reports and database records
+    pass through bounded queues between separate tasks, and REST calls and database writes run in threads,
+    so a slow request never delays price processing. Socket callbacks wait for space in the queues,
+    which pushes backpressure to the socket thread instead of dropping messages.
+    """
+    queue_names = ('trades', 'states', 'orders', 'reports', 'records')
+
+    def __init__(self, key: str, secret: str, client: Client = None, queue_size: int = 1000,
+                 metrics_interval: float = 60):
+        """
+        :param queue_size: capacity of every queue
+        :param metrics_interval: seconds between logged queue metrics, None disables them
+        """
+        super().__init__(key, secret, client=client)
+        self.queue_size = queue_size
+        self.metrics_interval = metrics_interval
+        self.queues: Dict[str, MeteredQueue] = dict()
+        self.loop = None
+        self.order_lock = None
+
+    def metrics(self) -> Dict[str, dict]:
+        return {name: queue.metrics() for name, queue in self.queues.items()}
+
+    def enqueue(self, name: str, message) -> NoReturn:
+        """
+        Puts a message into a queue from a socket thread, waiting while the queue is full
+        """
+        asyncio.run_coroutine_threadsafe(self.queues[name].put(message), self.loop).result()
+
+    def handle_message(self, message) -> NoReturn:
+        self.registry.inc('messages_total')
+        self.enqueue('trades', (time.perf_counter_ns(), message))
+
+    def handle_order(self, message) -> NoReturn:
+        self.enqueue('reports', message)
+
+    async def process_trades(self) -> NoReturn:
+        trades, states, orders = self.queues['trades'], self.queues['states'], self.queues['orders']
+        while True:
+            received, message = await trades.get()
+            message = self.process_message(message)
+            self.price = message['price']
+            if self.is_trading and not self.pending and self.roi_stoploss_check():
+                self.pending = 'SELL'
+                await orders.put(('SELL', 'MARKET'))
+            self.last_id = int(message['id'])
+            start = time.perf_counter_ns()
+            state = self.next_state([message])
+            self.registry.observe('bar_build_seconds', time.perf_counter_ns() - start)
+            if state is not None and not state.empty:
+                await states.put((received, state))
+            self.registry.observe('message_seconds', time.perf_counter_ns() - received)
+            trades.task_done()
+
+    async def process_states(self) -> NoReturn:
+        states, orders = self.queues['states'], self.queues['orders']
+        while True:
+            received, state = await states.get()
+            start = time.perf_counter_ns()
+            self.algorithm.set_state(state)
+            if self.bars is None:
+                self.data_drop(state)
+            self.rate_limiter.log(self.logger, logging.DEBUG, 'STATE IS UPDATED')
+            action = self.algorithm.action(self.is_trading)
+            end = time.perf_counter_ns()
+            self.registry.observe('indicator_seconds', end - start)
+            self.registry.observe('decision_seconds', end - received)
+            self.registry.inc('bars_total', state.shape[0])
+            if action and not self.pending:
+                if action == 'SELL':
+                    self.meta.set_sell_reason('SELL SIGNAL')
+                self.pending = action
+                await orders.put((action, self.algorithm.order_type))
+            states.task_done()
+
+    async def submit_orders(self) -> NoReturn:
+        orders = self.queues['orders']
+        while True:
+            action, order_type = await orders.get()
+            # execution reports of the order wait until its response is added to metadata
+            async with self.order_lock:
+                await self.loop.run_in_executor(None, self.act, action, order_type)
+            orders.task_done()
+
+    async def update_bnb_price(self) -> NoReturn:
+        get_avg_price = functools.partial(self.client.get_avg_price, symbol='BNBUSDT')
+        avg_price = await self.loop.run_in_executor(None, get_avg_price)
+        self.meta.bnb_price = float(avg_price['price'])
+
+    async def process_reports(self) -> NoReturn:
+        reports, records = self.queues['reports'], self.queues['records']
+        while True:
+            message = await reports.get()
+            async with self.order_lock:
+                if message['e'] == 'executionReport':
+                    if self.follow_order(message):
+                        record = TradeRecord.from_metadata(self.meta)
+                        await records.put(record)
+                        self.logger.debug(record)
+                        self.meta.flush()
+                        self.loop.create_task(self.update_bnb_price())
+                elif message['e'] == 'error':
+                    self.logger.error('HANDLE ORDER ERROR ' + message['m'])
+                    sys.exit()
+            reports.task_done()
+
+    async def write_records(self) -> NoReturn:
+        records = self.queues['records']
+        while True:
+            record = await records.get()
+            await self.loop.run_in_executor(None, self.write_record, record)
+            self.logger.info('DATABASE WAS UPDATED')
+            records.task_done()
+
+    async def log_metrics(self) -> NoReturn:
+        while True:
+            await asyncio.sleep(self.metrics_interval)
+            self.logger.info('QUEUES ' + str(self.metrics()))
+
+    async def run_sockets(self, socket_manager) -> NoReturn:
+        """
+        Waits for the sockets forever, or until a stand-in manager that does not run in a thread
+        has sent everything and the queues are empty
+        """
+        if isinstance(socket_manager, threading.Thread):
+            socket_manager.start()
+            await asyncio.Future()
+        if isinstance(socket_manager, SimulatedSocketManager):
+            # a replayed trade is handled with all that follows from it before the next one, as in TradingBot
+            socket_manager.settle = lambda: asyncio.run_coroutine_threadsafe(self.join_queues(), self.loop).result()
+        await self.loop.run_in_executor(None, socket_manager.start)
+        await self.join_queues()
+
+    async def join_queues(self) -> NoReturn:
+        for name in self.queue_names:
+            await self.queues[name].join()
+
+    async def run(self, pair: str, socket_manager=None) -> NoReturn:
+        self.loop = asyncio.get_running_loop()
+        self.queues = {name: MeteredQueue(name, self.queue_size) for name in self.queue_names}
+        self.order_lock = asyncio.Lock()
+        workers = [self.process_trades(), self.process_states(), self.submit_orders(), self.process_reports(),
+                   self.write_records()]
+        if self.metrics_interval:
+            workers.append(self.log_metrics())
+        tasks: List[asyncio.Task] = [self.loop.create_task(worker) for worker in workers]
+
+        socket_manager = socket_manager if socket_manager is not None else BinanceSocketManager(self.client)
+        socket_manager.start_user_socket(self.handle_order)
+        socket_manager.start_aggtrade_socket(pair, self.handle_message)
+        main = self.loop.create_task(self.run_sockets(socket_manager))
+        try:
+            # a failed worker stops the bot instead of leaving the queues to fill up
+            done, _ = await asyncio.wait(tasks + [main], return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                task.result()
+        finally:
+            socket_manager.close()
+            for task in tasks + [main]:
+                task.cancel()
+            await asyncio.gather(*tasks, main, return_exceptions=True)
+            self.logger.info('QUEUES ' + str(self.metrics()))
+
+    def listen(self, pair: str, socket_manager) -> NoReturn:
+        asyncio.run(self.run(pair, socket_manager))
+
+    def trade(self, pair: str, days: int, algorithm: BasicAlgorithm,
+              override: bool = True, stake_amount: int = 10, socket_manager=None) -> NoReturn:
+        """
+        This function is used for trading, see TradingBot.trade
+        :param socket_manager: BinanceSocketManager (created from the client by default) or a stand-in for it
+        """
+        self.logger = get_logger('trade')
+        self.set_metadata(pair, stake_amount, algorithm)
+        self.data_handler = DataHandler('trade')
+        self.get_historical_data(pair, days, override)
+        self.logger.info(pair + ' historical data for ' + str(days) + ' days was downloaded and processed')
+        self.listen(pair, socket_manager)
@@ -0,0 +1,189 @@
+import numpy as np
+from collections import deque
+from typing import Tuple
+
+
+class SMA:
+    """
+    Simple moving average that is updated in O(1) per value, same as talib.SMA
+    """
+    def __init__(self, period: int):
+        self.period = period
+        self.window = deque(maxlen=period)
+        self.total = 0.
+
+    def update(self, value: float) -> float:
+        if len(self.window) == self.period:
+            self.total -= self.window[0]
+        self.window.append(value)
+        self.total += value
+        if len(self.window) < self.period:
+            return np.nan
+        return self.total / self.period
+
+
+class EMA:
+    """
+    Exponential moving average seeded with the SMA of its first period values, same as talib.EMA
+    :param delay: number of values to skip before the seeding window starts (talib.MACD seeds its fast EMA late)
+    """
+    def __init__(self, period: int, delay: int = 0):
+        self.period = period
+        self.k = 2 / (period + 1)
+        self.delay = delay
+        self.window = deque(maxlen=period)
+        self.count = 0
+        self.value = np.nan
+
+    @property
+    def ready(self) -> bool:
+        return self.count >= self.delay + self.period
+
+    def update(self, value: float) -> float:
+        self.count += 1
+        if self.window is None:
+            self.value = (value - self.value) * self.k + self.value
+            return self.value
+        self.window.append(value)
+        if self.ready:
+            self.value = sum(self.window) / self.period
+            self.window = None
+        return self.value
+
+
+class TEMA:
+    """
+    Triple exponential moving average, same as talib.TEMA
+    """
+    def __init__(self, period: int):
+        self.ema1 = EMA(period)
+        self.ema2 = EMA(period)
+        self.ema3 = EMA(period)
+
+    def update(self, value: float) -> float:
+        ema1 = self.ema1.update(value)
+        if not self.ema1.ready:
+            return np.nan
+        ema2 = self.ema2.update(ema1)
+        if not self.ema2.ready:
+            return np.nan
+        ema3 = self.ema3.update(ema2)
+        if not self.ema3.ready:
+            return np.nan
+        return 3 * ema1 - 3 * ema2 + ema3
+
+
+class MACD:
+    """
+    Moving average convergence/divergence, same as talib.MACD
+    """
+    def __init__(self, fastperiod: int = 12, slowperiod: int = 26, signalperiod: int = 9):
+        if slowperiod < fastperiod:
+            fastperiod, slowperiod = slowperiod, fastperiod
+        self.fast = EMA(fastperiod, delay=slowperiod - fastperiod)
+        self.slow = EMA(slowperiod)
+        self.signal = EMA(signalperiod)
+
+    def update(self, value: float) -> Tuple[float, float, float]:
+        fast = self.fast.update(value)
+        slow = self.slow.update(value)
+        if not self.slow.ready:
+            return np.nan, np.nan, np.nan
+        macd = fast - slow
+        signal = self.signal.update(macd)
+        if not self.signal.ready:
+            return np.nan, np.nan, np.nan
+        return macd, signal, macd - signal
+
+
+class ADX:
+    """
+    Average directional movement index with Wilder smoothing, same as talib.ADX
+    """
+    def __init__(self, period: int = 14):
+        self.period = period
+        self.count = 0
+        self.prev_high = None
+        self.prev_low = None
+        self.prev_close = None
+        self.plus_dm = 0.
+        self.minus_dm = 0.
+        self.tr = 0.
+        self.sum_dx = 0.
+        self.value = np.nan
+
+    @staticmethod
+    def is_zero(value: float) -> bool:
+        return -1e-8 < value < 1e-8
+
+    def dx(self) -> Tuple[float, bool]:
+        if self.is_zero(self.tr):
+            return 0., False
+        minus_di = 100 * (self.minus_dm / self.tr)
+        plus_di = 100 * (self.plus_dm / self.tr)
+        total = minus_di + plus_di
+        if self.is_zero(total):
+            return 0., False
+        return 100 * (abs(minus_di - plus_di) / total), True
+
+    def update(self, high: float, low: float, close: float) -> float:
+        self.count += 1
+        if self.count == 1:
+            self.prev_high, self.prev_low, self.prev_close = high, low, close
+            return np.nan
+
+        diff_plus = high - self.prev_high
+        diff_minus = self.prev_low - low
+        true_range = max(high - low, abs(high - self.prev_close), abs(low - self.prev_close))
+        self.prev_high, self.prev_low, self.prev_close = high, low, close
+
+        if self.count > self.period:
+            self.minus_dm -= self.minus_dm / self.period
+            self.plus_dm -= self.plus_dm / self.period
+            self.tr -= self.tr / self.period
+        if diff_minus > 0 and diff_plus < diff_minus:
+            self.minus_dm += diff_minus
+        elif diff_plus > 0 and diff_plus > diff_minus:
+            self.plus_dm += diff_plus
+        self.tr += true_range
+
+        if self.count <= self.period:
+            return np.nan
+        dx, valid = self.dx()
+        if self.count < 2 * self.period:
+            self.sum_dx += dx
+            return np.nan
+        if self.count == 2 * self.period:
+            self.value = (self.sum_dx + dx) / self.period
+        elif valid:
+            self.value = (self.value * (self.period - 1) + dx) / self.period
+        return self.value
+
+
+class BollingerBands:
+    """
+    Bollinger bands over a rolling window, same as qtpylib.bollinger_bands
+    (the window is allowed to be shorter than the period while history is short)
+    """
+    def __init__(self, window: int = 20, stds: float = 2):
+        self.stds = stds
+        self.window = deque(maxlen=window)
+        self.mean = 0.
+        self.m2 = 0.
+
+    def update(self, value: float) -> Tuple[float, float, float]:
+        if len(self.window) == self.window.maxlen:
+            old = self.window[0]
+            self.window.append(value)
+            old_mean = self.mean
+            self.mean += (value - old) / len(self.window)
+            self.m2 += (value - old) * (value - self.mean + old - old_mean)
+        else:
+            self.window.append(value)
+            delta = value - self.mean
+            self.mean += delta / len(self.window)
+            self.m2 += delta * (value - self.mean)
+        if len(self.window) < 2:
+            return np.nan, self.mean, np.nan
+        std = np.sqrt(max(self.m2, 0.) / (len(self.window) - 1))
+        return self.mean - std * self.stds, self.mean, self.mean + std * self.stds
@@ -1,15 +1,21 @@
+import atexit
 import logging
+import logging.handlers
+import multiprocessing
 import os
+import queue
+import time
 from time import strftime
+from typing import Dict, NoReturn
 
+MODES = ['trade', 'backtest', 'dry_run']
 
-def get_logger(mode: str):
-    assert mode in ['trade', 'backtest', 'dry_run']
+# handlers of every configured mode are run by a listener thread, loggers only put records into its queue
+listeners: Dict[str, logging.handlers.QueueListener] = dict()
+worker_listeners: Dict[str, logging.handlers.QueueListener] = dict()
 
-    # create logger with 'spam_application'
-    logger = logging.getLogger(mode)
-    logger.setLevel(logging.DEBUG)
 
+def make_handlers(mode: str) -> list:
     # create file handler which logs even debug messages
     path = os.path.abspath(__file__)
     path = "/".join(path.split('/')[:-2]) + '/logging/' + mode + '/' + strftime("%Y_%m_%d-%H_%M_%S") + '.log'
@@ -24,9 +30,92 @@ def get_logger(mode: str):
     formatter = logging.Formatter('%(asctime)s - %(name)s - %(levelname)s - %(message)s')
     fh.setFormatter(formatter)
     ch.setFormatter(formatter)
+    return [fh, ch]
+
+
+def get_logger(mode: str) -> logging.Logger:
+    """
+    Configures the logger of the mode once per process, later calls return the same logger. Records are
+    formatted and written by a background thread, so logging does no I/O on the calling thread.
+    """
+    assert mode in MODES
+    logger = logging.getLogger(mode)
+    if mode in listeners:
+        return logger
+    logger.setLevel(logging.DEBUG)
+
+    records = queue.SimpleQueue()
+    listener = logging.handlers.QueueListener(records, *make_handlers(mode), respect_handler_level=True)
+    listener.start()
+    if not listeners and not worker_listeners:
+        atexit.register(stop_listeners)
+    listeners[mode] = listener
+
+    for handler in list(logger.handlers):
+        logger.removeHandler(handler)
+    logger.addHandler(logging.handlers.QueueHandler(records))
+    return logger
 
-    # add the handlers to the logger
-    logger.addHandler(fh)
-    logger.addHandler(ch)
 
+def worker_queue(mode: str) -> multiprocessing.Queue:
+    """
+    :return: queue that worker processes forward records of the mode to, see forward_logs.
+    They are written by the handlers of the mode in this process.
+    """
+    get_logger(mode)
+    if mode not in worker_listeners:
+        records = multiprocessing.Queue()
+        handlers = listeners[mode].handlers
+        worker_listeners[mode] = logging.handlers.QueueListener(records, *handlers, respect_handler_level=True)
+        worker_listeners[mode].start()
+    return worker_listeners[mode].queue
+
+
+def forward_logs(mode: str, records: multiprocessing.Queue) -> logging.Logger:
+    """
+    Sends records of the logger of the mode to the listener of the main process, it runs in a worker process
+    :param records: result of worker_queue in the main process
+    """
+    logger = logging.getLogger(mode)
+    logger.setLevel(logging.DEBUG)
+    for handler in list(logger.handlers):
+        logger.removeHandler(handler)
+    logger.addHandler(logging.handlers.QueueHandler(records))
+    # listeners of a forked parent do not run here, the mode counts as configured
+    listeners.clear()
+    worker_listeners.clear()
+    listeners[mode] = None
     return logger
+
+
+def stop_listeners() -> NoReturn:
+    """
+    Writes records that are still in the queues
+    """
+    for mode_listeners in (worker_listeners, listeners):
+        for listener in mode_listeners.values():
+            if listener is not None:
+                listener.stop()
+        mode_listeners.clear()
+
+
+class RateLimiter:
+    """
+    Lets a hot-path message through at most once per interval seconds, the next message that passes
+    tells how many were dropped. Messages are told apart by their text.
+    """
+    def __init__(self, interval: float = 1.):
+        self.interval = interval
+        self.last: Dict[str, float] = dict()
+        self.dropped: Dict[str, int] = dict()
+
+    def log(self, logger: logging.Logger, level: int, message: str) -> NoReturn:
+        if not logger.isEnabledFor(level):
+            return
+        now = time.monotonic()
+        if now - self.last.get(message, float('-inf')) < self.interval:
+            self.dropped[message] = self.dropped.get(message, 0) + 1
+            return
+        self.last[message] = now
+        dropped = self.dropped.pop(message, 0)
+        logger.log(level, message + (' (' + str(dropped) + ' MORE)' if dropped else ''))
@@ -0,0 +1,210 @@
+"""
+Counters and latency histograms of the live bot. Observing is a list increment under the GIL without locks,
+durations come from time.perf_counter_ns, so metrics stay on in production. Exporters read them from their
+own threads: PrometheusExporter serves the text format over HTTP, JsonExporter dumps them periodically.
+"""
+import bisect
+import json
+import os
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List, NoReturn
+
+# upper bounds of histogram buckets in ns, 1 us to 10 s, the last bucket is +Inf
+BUCKETS = tuple(int(m * 10 ** e) for e in range(3, 10) for m in (1, 2.5, 5)) + (10 ** 10, )
+PREFIX = 'freqbot_'
+
+LIVE_METRICS = {
+    'messages_total': ('counter', 'aggTrade messages handled'),
+    'bars_total': ('counter', 'bars completed by live trades'),
+    'orders_total': ('counter', 'orders sent to the exchange'),
+    'fills_total': ('counter', 'execution reports that completed an order'),
+    'records_total': ('counter', 'closed trades written to the database'),
+    'message_seconds': ('histogram', 'processing of one trade message'),
+    'decision_seconds': ('histogram', 'from receiving the message that completed a bar to the action'),
+    'bar_build_seconds': ('histogram', 'building bars from new trades'),
+    'indicator_seconds': ('histogram', 'set_state of the algorithm, indicators of new bars'),
+    'order_request_seconds': ('histogram', 'create_order request'),
+    'order_round_trip_seconds': ('histogram', 'from sending an order to its execution report'),
+    'db_write_seconds': ('histogram', 'writing a closed trade to the database'),
+}
+
+
+class Counter:
+    __slots__ = ('name', 'description', 'value')
+
+    def __init__(self, name: str, description: str):
+        self.name = name
+        self.description = description
+        self.value = 0
+
+    def inc(self, n: int = 1) -> NoReturn:
+        self.value += n
+
+
+class Histogram:
+    __slots__ = ('name', 'description', 'counts', 'count', 'sum')
+
+    def __init__(self, name: str, description: str):
+        self.name = name
+        self.description = description
+        self.counts = [0] * (len(BUCKETS) + 1)
+        self.count = 0
+        self.sum = 0
+
+    def observe(self, ns: int) -> NoReturn:
+        self.counts[bisect.bisect_left(BUCKETS, ns)] += 1
+        self.count += 1
+        self.sum += ns
+
+    def quantile(self, q: float) -> float:
+        """
+        :return: upper bound in seconds of the bucket of the quantile, inf if it is in the last bucket
+        """
+        rank, total = q * self.count, 0
+        for i, count in enumerate(self.counts):
+            total += count
+            if total >= rank and total:
+                return BUCKETS[i] / 1e9 if i < len(BUCKETS) else float('inf')
+        return 0.
+
+    def snapshot(self) -> dict:
+        return {'count': self.count, 'sum_seconds': self.sum / 1e9,
+                'mean_seconds': self.sum / 1e9 / self.count if self.count else 0.,
+                'p50_seconds': self.quantile(0.5), 'p99_seconds': self.quantile(0.99)}
+
+
+class MetricsRegistry:
+    def __init__(self, definitions: Dict[str, tuple] = None):
+        """
+        :param definitions: kind ('counter' or 'histogram') and description of every metric,
+        LIVE_METRICS by default
+        """
+        definitions = definitions if definitions is not None else LIVE_METRICS
+        kinds = {'counter': Counter, 'histogram': Histogram}
+        metrics = {name: kinds[kind](name, description) for name, (kind, description) in definitions.items()}
+        self.counters = {name: metric for name, metric in metrics.items() if isinstance(metric, Counter)}
+        self.histograms = {name: metric for name, metric in metrics.items() if isinstance(metric, Histogram)}
+        self.exporters: List[Exporter] = list()
+        self.started = time.time()
+
+    def inc(self, name: str, n: int = 1) -> NoReturn:
+        self.counters[name].inc(n)
+
+    def observe(self, name: str, ns: int) -> NoReturn:
+        self.histograms[name].observe(ns)
+
+    def snapshot(self) -> dict:
+        return {'time': time.time(), 'uptime_seconds': time.time() - self.started,
+                'counters': {name: counter.value for name, counter in self.counters.items()},
+                'histograms': {name: histogram.snapshot() for name, histogram in self.histograms.items()}}
+
+    def prometheus(self) -> str:
+        """
+        :return: metrics in the Prometheus text exposition format
+        """
+        lines = list()
+        for counter in self.counters.values():
+            name = PREFIX + counter.name
+            lines += ['# HELP ' + name + ' ' + counter.description, '# TYPE ' + name + ' counter',
+                      name + ' ' + str(counter.value)]
+        for histogram in self.histograms.values():
+            name = PREFIX + histogram.name
+            lines += ['# HELP ' + name + ' ' + histogram.description, '# TYPE ' + name + ' histogram']
+            total = 0
+            for bound, count in zip(BUCKETS + (None, ), histogram.counts):
+                total += count
+                le = repr(bound / 1e9) if bound is not None else '+Inf'
+                lines.append(name + '_bucket{le="' + le + '"} ' + str(total))
+            lines += [name + '_sum ' + repr(histogram.sum / 1e9), name + '_count ' + str(histogram.count)]
+        return '\n'.join(lines) + '\n'
+
+    def add_exporter(self, exporter: 'Exporter') -> NoReturn:
+        exporter.start(self)
+        self.exporters.append(exporter)
+
+    def close(self) -> NoReturn:
+        for exporter in self.exporters:
+            exporter.stop()
+        self.exporters.clear()
+
+
+class Exporter:
+    """
+    Publishes metrics of a registry from its own thread, it is started by MetricsRegistry.add_exporter
+    """
+    def start(self, registry: MetricsRegistry) -> NoReturn:
+        raise NotImplementedError
+
+    def stop(self) -> NoReturn:
+        pass
+
+
+class PrometheusExporter(Exporter):
+    """
+    Serves GET /metrics in the Prometheus text format
+    """
+    def __init__(self, port: int = 9090, host: str = '127.0.0.1'):
+        self.address = (host, port)
+        self.server = None
+
+    def start(self, registry: MetricsRegistry) -> NoReturn:
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path.split('?')[0] not in ['/', '/metrics']:
+                    self.send_error(404)
+                    return
+                body = registry.prometheus().encode()
+                self.send_response(200)
+                self.send_header('Content-Type', 'text/plain; version=0.0.4; charset=utf-8')
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        self.server = ThreadingHTTPServer(self.address, Handler)
+        self.address = self.server.server_address
+        threading.Thread(target=self.server.serve_forever, name='prometheus', daemon=True).start()
+
+    def stop(self) -> NoReturn:
+        if self.server is not None:
+            self.server.shutdown()
+            self.server.server_close()
+            self.server = None
+
+
+class JsonExporter(Exporter):
+    """
+    Writes MetricsRegistry.snapshot to a JSON file every interval seconds and when it is stopped
+    """
+    def __init__(self, filename: str, interval: float = 60):
+        self.filename = filename
+        self.interval = interval
+        self.registry = None
+        self.stopped = threading.Event()
+        self.thread = None
+
+    def dump(self) -> NoReturn:
+        with open(self.filename + '.tmp', 'w') as fh:
+            json.dump(self.registry.snapshot(), fh, indent=2)
+        os.replace(self.filename + '.tmp', self.filename)
+
+    def run(self) -> NoReturn:
+        while not self.stopped.wait(self.interval):
+            self.dump()
+
+    def start(self, registry: MetricsRegistry) -> NoReturn:
+        self.registry = registry
+        self.stopped.clear()
+        self.thread = threading.Thread(target=self.run, name='metrics_json', daemon=True)
+        self.thread.start()
+
+    def stop(self) -> NoReturn:
+        if self.thread is not None:
+            self.stopped.set()
+            self.thread.join()
+            self.thread = None
+            self.dump()
@@ -0,0 +1,120 @@
+import os
+import sys
+import copy
+import time
+from typing import List, Dict, Union, NoReturn
+
+from binance.websockets import BinanceSocketManager
+from binance.client import Client
+
+from freqbot.tradingbot import TradingBot, load_history
+from freqbot.tradestore import TradeSource, BinanceSource
+from freqbot.database import DataHandler
+from freqbot.metrics import MetricsRegistry
+from freqbot.algos import BasicAlgorithm
+from freqbot.logging import get_logger
+
+
+class PortfolioBot:
+    """
+    Trades every algorithm on every pair from one process. Each (pair, algorithm) is a TradingBot that shares
+    the client, the logger and the DataHandler, aggTrades of all pairs come over one combined stream and
+    execution reports of the user stream are routed by symbol and client order id.
+    """
+    def __init__(self, key: str, secret: str, client: Client = None, socket_manager=None):
+        """
+        :param socket_manager: BinanceSocketManager (created from the client by default) or a stand-in for it
+        """
+        self.key = key
+        self.secret = secret
+        self.client = client if client is not None else Client(key, secret)
+        self.socket_manager = socket_manager
+        self.trade_source: TradeSource = BinanceSource(self.client)
+        self.bots: Dict[str, List[TradingBot]] = dict()  # by pair
+        self.orders: Dict[str, TradingBot] = dict()  # by client order id
+        self.data_handler: Union[DataHandler, None] = None
+        self.logger = None
+        self.registry = MetricsRegistry()  # shared by all bots
+
+    def add_bot(self, pair: str, algorithm: BasicAlgorithm, stake_amount: int) -> TradingBot:
+        bot = TradingBot(self.key, self.secret, client=self.client)
+        bot.logger = self.logger.getChild(pair)
+        bot.data_handler = self.data_handler
+        bot.registry = self.registry
+        bot.set_metadata(pair, stake_amount, algorithm)
+        # every bot has at most one open order, so a constant id per bot is unique among open orders
+        client_order_id = 'freqbot_{}_{}'.format(pair, len(self.bots.get(pair, [])))
+        bot.request['newClientOrderId'] = client_order_id
+        self.orders[client_order_id] = bot
+        self.bots.setdefault(pair, list()).append(bot)
+        return bot
+
+    def get_historical_data(self, pair: str, days: int, override: bool) -> NoReturn:
+        """
+        Loads trades of the pair once and gives them to every bot of the pair
+        """
+        path = os.path.abspath(__file__)
+        path = "/".join(path.split('/')[:-2]) + '/historical_data/'
+        history = load_history(self.trade_source, pair, days, path, override)
+        for bot in self.bots[pair]:
+            bot.set_history(history.copy())
+
+        # cycle below is just to minimize lag that occurs because of loading dataset
+        for i in range(5):
+            agg_trades = self.client.aggregate_trade_iter(symbol=pair, last_id=self.bots[pair][0].last_id)
+            messages = [TradingBot.process_message(message) for message in agg_trades]
+            for bot in self.bots[pair]:
+                bot.update(messages, False)
+
+    def handle_message(self, message) -> NoReturn:
+        """
+        :param message: message of the combined stream, {'stream': ..., 'data': aggTrade}
+        """
+        received = time.perf_counter_ns()
+        message = message['data']
+        bots = self.bots.get(message['s'])
+        if not bots:
+            return
+        self.registry.inc('messages_total')
+        message = TradingBot.process_message(message)
+        for bot in bots:
+            bot.on_trade(message, received)
+
+    def handle_order(self, message) -> NoReturn:
+        if message['e'] == 'executionReport':
+            bot = self.orders.get(message['c'])
+            if bot is None and len(self.bots.get(message['s'], [])) == 1:
+                # order that was not sent by a bot, e.g. manual sell of its position
+                bot = self.bots[message['s']][0]
+            if bot is None:
+                self.logger.warning('EXECUTION REPORT OF UNKNOWN ORDER ' + message['s'] + ' ' + message['c'])
+                return
+            bot.handle_order(message)
+        elif message['e'] == 'error':
+            self.logger.error('HANDLE ORDER ERROR ' + message['m'])
+            sys.exit()
+
+    def trade(self, pairs: List[str], days: int, algorithms: List[BasicAlgorithm],
+              override: bool = True, stake_amount: int = 10) -> NoReturn:
+        """
+        This function is used for trading every algorithm on every pair
+        :param pairs: pairs to trade on
+        :param days: number of days from which data is collected
+        :param algorithms: algorithms to trade on, every pair gets its own copy of each
+        :param override: should data be override ?
+        :param stake_amount: amount of one stake
+        :return: trade function has no return but it saves logs
+        """
+        self.logger = get_logger('trade')
+        self.data_handler = DataHandler('trade')
+        for pair in pairs:
+            for algorithm in algorithms:
+                self.add_bot(pair, copy.deepcopy(algorithm), stake_amount)
+            self.get_historical_data(pair, days, override)
+            self.logger.info(pair + ' historical data for ' + str(days) + ' days was downloaded and processed')
+
+        socket_manager = self.socket_manager if self.socket_manager is not None else \
+            BinanceSocketManager(self.client)
+        socket_manager.start_user_socket(self.handle_order)
+        socket_manager.start_multiplex_socket([pair.lower() + '@aggTrade' for pair in pairs], self.handle_message)
+        socket_manager.start()
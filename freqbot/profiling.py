@@ -0,0 +1,195 @@
+import cProfile
+import io
+import os
+import pstats
+import time
+import pandas as pd
+from typing import Iterable, List, NoReturn
+
+# phases of a backtest task, persistence is timed in the main process
+PHASES = ('data_prep', 'indicators', 'signals', 'exits', 'records', 'persistence')
+# methods of algorithms that are timed as a phase wherever they are called from
+ALGORITHM_PHASES = {'update_indicators': 'indicators', 'populate_signals': 'signals', 'last_signals': 'signals'}
+
+
+class Phase:
+    __slots__ = ('profile', 'name')
+
+    def __init__(self, profile: 'TaskProfile', name: str):
+        self.profile = profile
+        self.name = name
+
+    def __enter__(self):
+        self.profile.enter(self.name)
+
+    def __exit__(self, *exc):
+        self.profile.exit()
+
+
+class TaskProfile:
+    """
+    Wall time of phases of one backtest task. Phases may be nested, every phase gets only the time
+    that was not spent in phases inside it, time outside of all phases is 'other'.
+    """
+    def __init__(self, algorithm: str = '', pair: str = '', tick_type: str = '', cprofile_path: str = None):
+        """
+        :param cprofile_path: cProfile stats of the task are written to this file if it is given
+        """
+        self.key = {'algorithm': algorithm, 'pair': pair, 'tick_type': tick_type}
+        self.cprofile_path = cprofile_path
+        self.seconds = dict.fromkeys(PHASES, 0.)
+        self.seconds['other'] = 0.
+        self.stack = ['other']
+        self.last = time.perf_counter()
+        self.started = self.last
+        self.wall = 0.
+        self.phases = dict()
+        self.profiler = None
+
+    def charge(self) -> NoReturn:
+        now = time.perf_counter()
+        self.seconds[self.stack[-1]] = self.seconds.get(self.stack[-1], 0.) + now - self.last
+        self.last = now
+
+    def enter(self, name: str) -> NoReturn:
+        self.charge()
+        self.stack.append(name)
+
+    def exit(self) -> NoReturn:
+        self.charge()
+        self.stack.pop()
+
+    def phase(self, name: str) -> Phase:
+        if name not in self.phases:
+            self.phases[name] = Phase(self, name)
+        return self.phases[name]
+
+    def iterate(self, name: str, iterable: Iterable) -> Iterable:
+        """
+        Yields items of the iterable, producing every item is timed as the phase
+        """
+        iterator = iter(iterable)
+        phase = self.phase(name)
+        while True:
+            with phase:
+                try:
+                    item = next(iterator)
+                except StopIteration:
+                    return
+            yield item
+
+    def instrument(self, algorithm) -> 'InstrumentedAlgorithm':
+        return InstrumentedAlgorithm(self, algorithm)
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        self.last = self.started
+        self.profiler = cProfile.Profile() if self.cprofile_path else None
+        if self.profiler is not None:
+            self.profiler.enable()
+        return self
+
+    def __exit__(self, *exc):
+        if self.profiler is not None:
+            self.profiler.disable()
+            self.profiler.dump_stats(self.cprofile_path)
+        self.charge()
+        self.wall = time.perf_counter() - self.started
+
+    def line(self) -> dict:
+        """
+        :return: key of the task, its wall time and seconds of every phase
+        """
+        return dict(self.key, wall=self.wall, **self.seconds)
+
+
+class NullProfile(TaskProfile):
+    """
+    Profile of tasks that are not profiled, phases cost a call to an empty context manager
+    """
+    def enter(self, name: str) -> NoReturn:
+        pass
+
+    def exit(self) -> NoReturn:
+        pass
+
+    def iterate(self, name: str, iterable: Iterable) -> Iterable:
+        return iterable
+
+    def instrument(self, algorithm) -> 'InstrumentedAlgorithm':
+        return InstrumentedAlgorithm(None, algorithm)
+
+
+NULL_PROFILE = NullProfile()
+
+
+class InstrumentedAlgorithm:
+    """
+    Times ALGORITHM_PHASES methods of the algorithm while the context is open, the class of the algorithm
+    is not changed, the timed methods shadow its methods on the instance
+    """
+    def __init__(self, profile: TaskProfile, algorithm):
+        self.profile = profile
+        self.algorithm = algorithm
+
+    @staticmethod
+    def timed(phase: Phase, method):
+        def call(*args, **kwargs):
+            with phase:
+                return method(*args, **kwargs)
+        return call
+
+    def __enter__(self):
+        if self.profile is not None:
+            for method, name in ALGORITHM_PHASES.items():
+                setattr(self.algorithm, method, self.timed(self.profile.phase(name), getattr(self.algorithm, method)))
+        return self.algorithm
+
+    def __exit__(self, *exc):
+        if self.profile is not None:
+            for method in ALGORITHM_PHASES:
+                self.algorithm.__dict__.pop(method, None)
+
+
+def report(lines: List[dict]) -> pd.DataFrame:
+    """
+    :param lines: TaskProfile.line of every task, lines without a task key are phases of the main process
+    :return: phases ranked by seconds spent in them over all tasks, their share of all time, number of tasks
+    they took time in, mean per task and the task that spent the most time in them
+    """
+    tasks = pd.DataFrame(lines)
+    phases = [phase for phase in PHASES + ('other', ) if phase in tasks.columns]
+    tasks[phases] = tasks[phases].fillna(0.)
+    total = tasks[phases].to_numpy().sum()
+    frame = pd.DataFrame(index=pd.Index(phases, name='phase'))
+    frame['seconds'] = tasks[phases].sum()
+    frame['share'] = frame['seconds'] / total if total else 0.
+    frame['tasks'] = (tasks[phases] > 0).sum()
+    frame['mean_seconds'] = frame['seconds'] / frame['tasks'].where(frame['tasks'] > 0)
+    frame['max_seconds'] = tasks[phases].max()
+    slowest = tasks[phases].idxmax()
+    keys = tasks[['algorithm', 'pair', 'tick_type']].fillna('').astype(str)
+    frame['slowest'] = [' '.join(keys.loc[slowest[phase]]).strip() for phase in phases]
+    return frame.sort_values('seconds', ascending=False)
+
+
+def merge_cprofile(filenames: List[str], filename: str, top: int = 30) -> str:
+    """
+    Adds up cProfile stats of tasks and saves them
+    :return: the top functions by cumulative time
+    """
+    stream = io.StringIO()
+    stats = pstats.Stats(*filenames, stream=stream)
+    stats.dump_stats(filename)
+    stats.sort_stats('cumulative').print_stats(top)
+    return stream.getvalue()
+
+
+def profile_path(mode: str, run: str) -> str:
+    """
+    :return: directory of profiles of the run in logging/<mode>/profiles/
+    """
+    path = os.path.abspath(__file__)
+    path = "/".join(path.split('/')[:-2]) + '/logging/' + mode + '/profiles/' + run
+    os.makedirs(path, exist_ok=True)
+    return path
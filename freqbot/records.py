@@ -0,0 +1,111 @@
+import numpy as np
+from datetime import timezone
+from typing import NoReturn
+
+# one closed trade, a backtest keeps all of its trades in one array of this type
+TRADE_DTYPE = np.dtype([
+    ('start_time', 'M8[ms]'),   # UTC
+    ('duration', 'f8'),         # seconds
+    ('start_price', 'f8'),
+    ('end_price', 'f8'),
+    ('quantity', 'f8'),
+    ('fee', 'f8'),
+    ('pair', 'U16'),
+    ('algorithm', 'U32'),
+    ('sell_reason', 'U12'),
+    ('order_type', 'U8'),
+    ('limit_type', 'U8'),
+])
+
+
+class TradeRecord:
+    """
+    Closed live trade, a slotted snapshot of OrderMetadata. Items can be read like keys of vars(OrderMetadata),
+    so DataHandler takes it wherever it takes that dict.
+    """
+    __slots__ = ('quantity', 'start_price', 'end_price', 'pair', 'ctime', 'open_time', 'start_time', 'end_time',
+                 'sell_reason', 'fee', 'order_type', 'limit_type', 'algorithm_name')
+
+    def __init__(self, **values):
+        for name in self.__slots__:
+            setattr(self, name, values.get(name))
+
+    @classmethod
+    def from_metadata(cls, meta) -> 'TradeRecord':
+        record = cls.__new__(cls)
+        for name in cls.__slots__:
+            setattr(record, name, getattr(meta, name))
+        return record
+
+    def __getitem__(self, name: str):
+        return getattr(self, name)
+
+    def __repr__(self):
+        return 'TradeRecord(' + ', '.join(name + '=' + repr(getattr(self, name)) for name in self.__slots__) + ')'
+
+
+class TradeArray:
+    """
+    Structured array of TRADE_DTYPE that grows by doubling
+    """
+    def __init__(self, capacity: int = 64):
+        self.data = np.zeros(capacity, dtype=TRADE_DTYPE)
+        self.size = 0
+
+    def reserve(self, n: int) -> NoReturn:
+        if self.size + n > self.data.shape[0]:
+            data = np.zeros(max(2 * self.data.shape[0], self.size + n), dtype=TRADE_DTYPE)
+            data[:self.size] = self.data[:self.size]
+            self.data = data
+
+    def append(self, start_time, duration: float, start_price: float, end_price: float, quantity: float, fee: float,
+               pair: str, algorithm: str, sell_reason: str, order_type: str = 'MARKET', limit_type: str = None):
+        """
+        :param start_time: datetime of the entry, tz-aware or UTC
+        :param duration: seconds
+        """
+        if getattr(start_time, 'tzinfo', None) is not None:
+            start_time = start_time.astimezone(timezone.utc).replace(tzinfo=None)
+        self.reserve(1)
+        self.data[self.size] = (np.datetime64(start_time, 'ms'), duration, start_price, end_price, quantity, fee, pair,
+                                algorithm, sell_reason, order_type, limit_type or '')
+        self.size += 1
+
+    def append_metadata(self, metadata) -> NoReturn:
+        """
+        :param metadata: vars(OrderMetadata) or TradeRecord
+        """
+        self.append(np.datetime64(metadata['open_time'], 'ms'), metadata['end_time'] - metadata['start_time'],
+                    metadata['start_price'], metadata['end_price'], metadata['quantity'], metadata['fee'],
+                    metadata['pair'], metadata['algorithm_name'], metadata['sell_reason'], metadata['order_type'],
+                    metadata['limit_type'])
+
+    def extend(self, trades: np.ndarray) -> NoReturn:
+        self.reserve(trades.shape[0])
+        self.data[self.size: self.size + trades.shape[0]] = trades
+        self.size += trades.shape[0]
+
+    def array(self) -> np.ndarray:
+        return self.data[:self.size]
+
+    def __getstate__(self):
+        # spare capacity is not sent to the parent process
+        return {'data': self.array(), 'size': self.size}
+
+
+def incomes(trades: np.ndarray) -> np.ndarray:
+    return (trades['end_price'] - trades['start_price']) * trades['quantity'] - trades['fee']
+
+
+def main_lines(trades: np.ndarray) -> list:
+    """
+    :return: MAIN lines of all trades, columns as in DataHandler.main_columns
+    """
+    start_price, end_price, quantity = trades['start_price'], trades['end_price'], trades['quantity']
+    columns = [trades['start_time'].astype(np.int64), np.round(trades['duration'] / 60, 4), np.round(start_price, 4),
+               np.round(end_price, 4), np.round(end_price / start_price, 4), trades['sell_reason'],
+               np.round(incomes(trades), 6), np.round(trades['fee'], 6), trades['pair'], trades['algorithm'],
+               np.round(start_price * quantity, 4), trades['order_type'],
+               [limit_type or None for limit_type in trades['limit_type'].tolist()]]
+    return list(zip(*(column if isinstance(column, list) else column.tolist() for column in columns)))
+
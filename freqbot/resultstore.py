@@ -0,0 +1,136 @@
+import glob
+import os
+import shutil
+import time
+import numpy as np
+import pandas as pd
+from typing import Union, NoReturn
+
+from freqbot.database import ResultStore, DataHandler, StorageProfile, PROFILES
+from freqbot.records import TRADE_DTYPE, TradeArray, main_lines
+from freqbot.statistics import KEYS, TradeStatistics, factorize
+
+
+class ColumnarStore(ResultStore):
+    """
+    Trades as append-only chunks of TRADE_DTYPE .npy files in databases/<filename>/<run>/<algorithm>/<pair>/.
+    Every write adds new chunks and nothing is rewritten, so results of large runs are scanned with memory
+    mapping instead of being read row by row, and runs are kept side by side.
+    """
+    def __init__(self, filename: str, run: str = None, profile: Union[str, StorageProfile] = 'live',
+                 flush_size: int = 1000):
+        """
+        :param run: name of the partition of this run, the time it was started by default
+        :param profile: chunks are synced to disk unless the profile has synchronous=OFF
+        :param flush_size: number of trades of update that are written as one chunk
+        """
+        path = os.path.abspath(__file__)
+        self.path = "/".join(path.split('/')[:-2]) + '/databases/' + filename
+        self.run = run if run is not None else time.strftime('%Y%m%d-%H%M%S')
+        profile = PROFILES[profile] if isinstance(profile, str) else profile
+        self.durable = profile.pragmas['synchronous'] != 'OFF'
+        self.flush_size = flush_size
+        self.buffer = TradeArray()
+
+    def run_path(self, run: str = None) -> str:
+        return os.path.join(self.path, run if run is not None else self.run)
+
+    def save(self, array: np.ndarray, filename: str) -> NoReturn:
+        # written under a temporary name, so a scan never sees a partial chunk
+        with open(filename + '.tmp', 'wb') as fh:
+            np.save(fh, array)
+            if self.durable:
+                fh.flush()
+                os.fsync(fh.fileno())
+        os.replace(filename + '.tmp', filename)
+
+    def insert_trades(self, trades: np.ndarray) -> NoReturn:
+        """
+        Trades of every (algorithm, pair) are written as a new chunk of its partition
+        """
+        if trades.shape[0] == 0:
+            return
+        algos, algo_codes = factorize(trades['algorithm'])
+        pairs, pair_codes = factorize(trades['pair'])
+        codes = algo_codes * pairs.shape[0] + pair_codes
+        order = np.argsort(codes, kind='stable')
+        codes = codes[order]
+        bounds = np.flatnonzero(np.concatenate(([True], codes[1:] != codes[:-1], [True])))
+        for lo, hi in zip(bounds[:-1], bounds[1:]):
+            code = codes[lo]
+            directory = os.path.join(self.run_path(), str(algos[code // pairs.shape[0]]),
+                                     str(pairs[code % pairs.shape[0]]))
+            os.makedirs(directory, exist_ok=True)
+            number = len(glob.glob(os.path.join(directory, '*.npy')))
+            self.save(trades[order[lo:hi]], os.path.join(directory, '{:06d}.npy'.format(number)))
+
+    def update(self, metadata) -> NoReturn:
+        self.buffer.append_metadata(metadata)
+        if self.buffer.size >= self.flush_size:
+            self.flush()
+
+    def flush(self) -> NoReturn:
+        if self.buffer.size:
+            self.insert_trades(self.buffer.array())
+            self.buffer = TradeArray()
+
+    def scan(self, run: str = None, algorithm: str = None, pair: str = None) -> np.ndarray:
+        """
+        :param run: name of a run, this run by default and '*' for all of them
+        :param algorithm: only trades of this algorithm, all by default
+        :param pair: only trades of this pair, all by default
+        :return: trades of matching partitions
+        """
+        self.flush()
+        pattern = os.path.join(self.run_path(run), algorithm or '*', pair or '*', '*.npy')
+        chunks = [np.load(filename, mmap_mode='r') for filename in sorted(glob.glob(pattern))]
+        return np.concatenate(chunks) if chunks else np.zeros(0, dtype=TRADE_DTYPE)
+
+    def select_trades(self, pair: str, algorithm: str, start_time: int = None, end_time: int = None) -> pd.DataFrame:
+        trades = self.scan(algorithm=algorithm, pair=pair)
+        start = trades['start_time'].astype(np.int64)
+        selected = np.ones(trades.shape[0], dtype=bool)
+        if start_time is not None:
+            selected &= start >= start_time
+        if end_time is not None:
+            selected &= start < end_time
+        trades = trades[selected][np.argsort(start[selected], kind='stable')]
+        return pd.DataFrame(main_lines(trades), columns=DataHandler.main_columns)
+
+    def write_statistics(self, trades: np.ndarray) -> NoReturn:
+        summary = TradeStatistics(trades).summary()
+        dtypes = {key: TRADE_DTYPE[field] for key, field in KEYS.items()}
+        os.makedirs(self.run_path(), exist_ok=True)
+        self.save(summary.to_records(index=False, column_dtypes=dtypes),
+                  os.path.join(self.run_path(), 'statistics.npy'))
+
+    def statistics(self) -> pd.DataFrame:
+        """
+        :return: saved statistics of this run, or statistics of its trades if they were not saved
+        """
+        filename = os.path.join(self.run_path(), 'statistics.npy')
+        if os.path.exists(filename):
+            return pd.DataFrame(np.load(filename))
+        return TradeStatistics(self.scan()).summary()
+
+    def drop_all_tables(self) -> NoReturn:
+        """
+        Removes trades of this run, other runs are kept
+        """
+        self.buffer = TradeArray()
+        shutil.rmtree(self.run_path(), ignore_errors=True)
+
+    def close(self) -> NoReturn:
+        self.flush()
+
+
+def open_store(storage: str, filename: str, profile: Union[str, StorageProfile] = 'live',
+               run: str = None) -> ResultStore:
+    """
+    :param storage: sqlite (DataHandler) or columnar (ColumnarStore)
+    :param run: name of the run in a columnar store, a SQLite file keeps one run
+    """
+    assert storage in ['sqlite', 'columnar']
+    if storage == 'sqlite':
+        return DataHandler(filename, profile=profile)
+    return ColumnarStore(filename, run, profile)
@@ -0,0 +1,74 @@
+import numpy as np
+from bisect import bisect_right
+from typing import Union, Tuple
+
+
+class RoiSchedule:
+    """
+    ROI table and stoploss of an algorithm compiled once into sorted breakpoints. A trade that is open
+    for diff seconds uses the rate of the smallest key (in minutes) with key * 60 > diff, found by bisect.
+    """
+    def __init__(self, roi: dict, stoploss: float):
+        table = {float(key): value for key, value in roi.items()}
+        table.setdefault(np.inf, 0)
+        keys = sorted(table)
+        self.breakpoints = [key * 60 for key in keys]
+        self.rates = [table[key] for key in keys]
+        self.breakpoints_array = np.array(self.breakpoints)
+        self.rates_array = np.array(self.rates, dtype=float)
+        self.stoploss = stoploss
+
+    def rate(self, diff: float) -> float:
+        return self.rates[bisect_right(self.breakpoints, diff)]
+
+    def check(self, start_price: float, price: float, diff: float) -> Union[Tuple[float, str], None]:
+        """
+        :param diff: seconds since the trade was opened
+        :return: exit price and sell reason if ROI or stoploss is reached, otherwise None
+        """
+        profit_price = start_price * (1 + self.rate(diff))
+        if price > profit_price:
+            return profit_price, 'ROI'
+        loss_price = start_price * (1 + self.stoploss)
+        if price < loss_price:
+            return loss_price, 'STOPLOSS'
+        return None
+
+    def first_exit(self, start_price: float, entry_time: float, times: np.ndarray, prices: np.ndarray,
+                   sell: np.ndarray = None, resolution: int = 1) -> Union[Tuple[int, float, str], None]:
+        """
+        Vectorized check over the bars after an entry. Bars are examined in windows that double in size,
+        so a trade that is closed soon does not cost a pass over the whole array.
+        :param entry_time: time of the entry in units of 1 / resolution seconds
+        :param times: time of every following bar in the same units
+        :param prices: close price of every following bar
+        :param sell: SELL decisions of the algorithm for every following bar, they close the trade too
+        :param resolution: units per second, e.g. 10 ** 9 for nanoseconds, the time a trade is open is truncated
+        to whole seconds like in the bar by bar check
+        :return: index of the first exit bar, exit price and sell reason or None if the trade is never closed
+        """
+        loss_price = start_price * (1 + self.stoploss)
+        n = prices.shape[0]
+        lo = 0
+        width = 64
+        while lo < n:
+            hi = min(lo + width, n)
+            diff = (times[lo:hi] - entry_time) // resolution
+            rates = self.rates_array[np.searchsorted(self.breakpoints_array, diff, side='right')]
+            profit_price = start_price * (1 + rates)
+            price = prices[lo:hi]
+            roi_hit = price > profit_price
+            loss_hit = price < loss_price
+            hit = roi_hit | loss_hit
+            if sell is not None:
+                hit |= sell[lo:hi]
+            if hit.any():
+                k = int(np.argmax(hit))
+                if roi_hit[k]:
+                    return lo + k, profit_price[k], 'ROI'
+                if loss_hit[k]:
+                    return lo + k, loss_price, 'STOPLOSS'
+                return lo + k, prices[lo + k], 'SELL SIGNAL'
+            lo = hi
+            width *= 2
+        return None
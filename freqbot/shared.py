@@ -0,0 +1,68 @@
+import numpy as np
+import pandas as pd
+import os
+import json
+import shutil
+import tempfile
+from typing import List, NoReturn
+
+from freqbot.tools import index2stamps, stamps2index
+
+
+def save_frame(frame: pd.DataFrame, path: str) -> NoReturn:
+    """
+    Saves a frame with numeric columns and DatetimeIndex as .npy files that load_frame can map without copying
+    """
+    # one contiguous row per column, so every column of the loaded frame is contiguous too
+    np.save(path + '.values.npy', np.ascontiguousarray(frame.to_numpy(dtype=float).T))
+    np.save(path + '.index.npy', index2stamps(frame.index))
+    with open(path + '.json', 'w') as fh:
+        json.dump({'columns': list(frame.columns), 'tz': str(frame.index.tz) if frame.index.tz else None}, fh)
+
+
+def load_frame(path: str) -> pd.DataFrame:
+    with open(path + '.json') as fh:
+        meta = json.load(fh)
+    values = np.load(path + '.values.npy', mmap_mode='r')
+    index = stamps2index(np.load(path + '.index.npy', mmap_mode='r'), meta['tz'])
+    return pd.DataFrame(values.T, columns=meta['columns'], index=index, copy=False)
+
+
+class SharedFrame:
+    """
+    Bar frame saved once as memory-mapped .npy files. The object itself holds only a path and the pair name,
+    so it is cheap to send to worker processes, and attach maps the data without copying it.
+    """
+    def __init__(self, frame: pd.DataFrame, path: str):
+        self.name = getattr(frame, 'name', None)
+        self.path = path
+        save_frame(frame, path)
+
+    def attach(self) -> pd.DataFrame:
+        frame = load_frame(self.path)
+        frame.name = self.name
+        return frame
+
+
+class SharedFrames:
+    """
+    Temporary directory (in /dev/shm when it exists) holding frames published for worker processes
+    """
+    def __init__(self):
+        root = '/dev/shm' if os.path.isdir('/dev/shm') else None
+        self.directory = tempfile.mkdtemp(prefix='freqbot_', dir=root)
+        self.frames: List[SharedFrame] = list()
+
+    def publish(self, frame: pd.DataFrame) -> SharedFrame:
+        shared = SharedFrame(frame, os.path.join(self.directory, str(len(self.frames))))
+        self.frames.append(shared)
+        return shared
+
+    def close(self) -> NoReturn:
+        shutil.rmtree(self.directory, ignore_errors=True)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
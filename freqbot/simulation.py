@@ -0,0 +1,211 @@
+import os
+import time
+import pandas as pd
+from collections import deque
+from typing import Dict, Iterable, Callable, List, NoReturn, Union
+
+from freqbot.tradestore import TradeSource, TradeStore, DAY
+
+
+class SimulatedExchange(TradeSource):
+    """
+    Local stand-in for binance Client and for the trade source of a bot. Trades up to the start time are history,
+    trades after it are replayed by SimulatedSocketManager. Market orders are filled at the last replayed price,
+    limit orders at their price once a replayed trade reaches it, and their execution reports are sent
+    to the user stream after the message that caused them.
+    """
+    def __init__(self, trades: Dict[str, pd.DataFrame], start: int, fee: float = 0.00075, bnb_price: float = 300.):
+        """
+        :param trades: trades of every pair in load_dataset format
+        :param start: timestamp in ms that separates history from replayed trades
+        :param fee: commission per side, paid in BNB
+        """
+        self.data = {pair: frame.reset_index(drop=True) for pair, frame in trades.items()}
+        self.time = start
+        self.fee = fee
+        self.bnb_price = bnb_price
+        self.prices: Dict[str, float] = dict()
+        self.reports = deque()
+        self.orders: List[dict] = list()
+        self.open_orders: List[dict] = list()
+
+    @classmethod
+    def recorded(cls, pairs: List[str], days: float, replay_days: float, path: str = None, **kwargs):
+        """
+        Exchange over trades that trade, backtest or the trade store recorded in historical_data/trades/
+        :param days: history before the replayed trades
+        :param replay_days: trades of the last replay_days of the stores are replayed
+        """
+        if path is None:
+            path = os.path.abspath(__file__)
+            path = "/".join(path.split('/')[:-2]) + '/historical_data/'
+        trades = {pair: TradeStore(path, pair, TradeSource()).window(days + replay_days) for pair in pairs}
+        for pair, data in trades.items():
+            assert not data.empty, 'no recorded trades of ' + pair + ' in ' + path
+        end = max(int(data['timestamp'].iloc[-1]) for data in trades.values())
+        return cls(trades, end - int(replay_days * DAY), **kwargs)
+
+    def now(self) -> int:
+        return self.time
+
+    def clock(self) -> float:
+        """
+        :return: seconds since epoch of the last replayed trade, clock of OrderMetadata in a dry run
+        """
+        return self.time / 1000
+
+    def history(self, pair: str) -> pd.DataFrame:
+        data = self.data[pair]
+        return data.loc[data['timestamp'] <= self.time]
+
+    def trades(self, pair: str, start_time: int = None, last_id: int = None) -> Iterable[dict]:
+        history = self.history(pair)
+        rows = history.loc[history['id'] > last_id] if last_id is not None else \
+            history.loc[history['timestamp'] >= start_time]
+        for row in rows.itertuples(index=False):
+            yield {'a': row.id, 'p': row.price, 'q': row.amount, 'f': row.id, 'l': row.id, 'T': row.timestamp,
+                   'm': False, 'M': True}
+
+    def aggregate_trade_iter(self, symbol: str, start_str=None, last_id: int = None) -> Iterable[dict]:
+        return self.trades(symbol, start_time=start_str, last_id=last_id)
+
+    def get_symbol_info(self, symbol: str) -> dict:
+        return {'symbol': symbol, 'filters': [{'filterType': 'PRICE_FILTER', 'tickSize': '0.00000100'},
+                                              {'filterType': 'PERCENT_PRICE'},
+                                              {'filterType': 'LOT_SIZE', 'stepSize': '0.00000100'}]}
+
+    def get_avg_price(self, **params) -> dict:
+        # keyword arguments only, as Client.get_avg_price
+        return {'mins': 5, 'price': str(self.bnb_price)}
+
+    def fill(self, order: dict) -> float:
+        """
+        Sends the execution report of the whole order
+        :return: commission in BNB
+        """
+        pair, quantity, price = order['symbol'], order['quantity'], order['price']
+        commission = price * quantity * self.fee / self.bnb_price
+        self.reports.append({'e': 'executionReport', 'E': self.time, 's': pair, 'c': order['clientOrderId'],
+                             'S': order['side'], 'o': order['type'], 'f': 'GTC', 'q': str(quantity), 'x': 'TRADE',
+                             'X': 'FILLED', 'l': str(quantity), 'L': str(price), 'n': str(commission), 'N': 'BNB',
+                             'T': self.time})
+        return commission
+
+    def fill_limit_orders(self, pair: str) -> NoReturn:
+        """
+        Fills open limit orders of the pair that the last replayed price has reached
+        """
+        price = self.prices[pair]
+        for order in [order for order in self.open_orders if order['symbol'] == pair]:
+            if (price <= order['price']) if order['side'] == 'BUY' else (price >= order['price']):
+                self.open_orders.remove(order)
+                self.fill(order)
+
+    def create_order(self, **request) -> dict:
+        assert request['type'] in ['MARKET', 'LIMIT'], 'only market and limit orders are simulated'
+        pair = request['symbol']
+        price = self.prices[pair] if request['type'] == 'MARKET' else float(request['price'])
+        quantity = float(request['quantity'])
+        client_order_id = request.get('newClientOrderId', 'simulated_' + str(len(self.orders)))
+        order = {'symbol': pair, 'side': request['side'], 'type': request['type'], 'clientOrderId': client_order_id,
+                 'quantity': quantity, 'price': price, 'time': self.time}
+        self.orders.append(order)
+        response = {'symbol': pair, 'clientOrderId': client_order_id, 'transactTime': self.time,
+                    'type': request['type'], 'side': request['side'], 'status': 'NEW', 'executedQty': '0',
+                    'fills': []}
+        if request['type'] == 'LIMIT':
+            self.open_orders.append(order)
+            return response
+        commission = self.fill(order)
+        return dict(response, status='FILLED', executedQty=str(quantity),
+                    fills=[{'price': str(price), 'qty': str(quantity), 'commission': str(commission),
+                            'commissionAsset': 'BNB'}])
+
+
+class SimulatedSocketManager:
+    """
+    Stand-in for BinanceSocketManager that replays trades of a SimulatedExchange after its start time.
+    Unlike the real manager start does not spawn a thread, it returns when the replay is over.
+    """
+    def __init__(self, exchange: SimulatedExchange, speed: float = None):
+        """
+        :param speed: seconds of trades replayed per second, None replays as fast as possible
+        """
+        assert speed is None or speed > 0
+        self.exchange = exchange
+        self.speed = speed
+        self.streams: Dict[str, Callable] = dict()
+        self.user_callback = None
+        self.replayed = 0
+        self.seconds = 0.
+        # waits until the bot has handled everything it was sent, set by bots that handle messages
+        # in other threads, so the replay does not run ahead of them
+        self.settle: Union[Callable[[], NoReturn], None] = None
+
+    def start_aggtrade_socket(self, symbol: str, callback: Callable) -> str:
+        self.streams[symbol.lower() + '@aggTrade'] = lambda message: callback(message['data'])
+        return symbol.lower() + '@aggTrade'
+
+    def start_multiplex_socket(self, streams: List[str], callback: Callable) -> str:
+        for stream in streams:
+            self.streams[stream] = callback
+        return 'multiplex'
+
+    def start_user_socket(self, callback: Callable) -> str:
+        self.user_callback = callback
+        return 'user'
+
+    def messages(self) -> Iterable[dict]:
+        """
+        :return: combined stream messages of all subscribed pairs in time order
+        """
+        frames = list()
+        for pair, data in self.exchange.data.items():
+            if pair.lower() + '@aggTrade' in self.streams:
+                live = data.loc[data['timestamp'] > self.exchange.time].copy()
+                live['pair'] = pair
+                frames.append(live)
+        if not frames:
+            return
+        live = pd.concat(frames).sort_values('timestamp', kind='stable')
+        for row in live.itertuples(index=False):
+            yield {'stream': row.pair.lower() + '@aggTrade',
+                   'data': {'e': 'aggTrade', 'E': row.timestamp, 's': row.pair, 'a': row.id,
+                            'p': '{:.8f}'.format(row.price), 'q': '{:.8f}'.format(row.amount), 'f': row.id,
+                            'l': row.id, 'T': row.timestamp, 'm': False, 'M': True}}
+
+    def wait(self) -> NoReturn:
+        if self.settle is not None:
+            self.settle()
+
+    def deliver_reports(self) -> NoReturn:
+        self.wait()
+        if not self.exchange.reports:
+            return
+        while self.exchange.reports:
+            report = self.exchange.reports.popleft()
+            if self.user_callback is not None:
+                self.user_callback(report)
+        self.wait()
+
+    def start(self) -> NoReturn:
+        start, first = time.perf_counter(), None
+        for message in self.messages():
+            timestamp = int(message['data']['T'])
+            if self.speed is not None:
+                first = timestamp if first is None else first
+                delay = (timestamp - first) / 1000 / self.speed - (time.perf_counter() - start)
+                if delay > 0:
+                    time.sleep(delay)
+            self.exchange.time = timestamp
+            self.exchange.prices[message['data']['s']] = float(message['data']['p'])
+            if self.exchange.open_orders:
+                self.exchange.fill_limit_orders(message['data']['s'])
+            self.streams[message['stream']](message)
+            self.deliver_reports()
+            self.replayed += 1
+        self.seconds = time.perf_counter() - start
+
+    def close(self) -> NoReturn:
+        self.streams.clear()
+        self.user_callback = None
@@ -0,0 +1,199 @@
+import numpy as np
+import pandas as pd
+from typing import Dict, List, Tuple
+
+from freqbot.records import incomes
+
+# key value of lines that cover every pair or every algorithm
+ALL = 'ALL'
+STATISTICS_COLUMNS = ('num_loss', 'num_profit', 'num_total', 'ratio_num', 'loss', 'profit', 'ratio', 'total',
+                      'av_duration', 'profit_factor', 'max_drawdown', 'sharpe', 'sortino', 'exposure')
+# trade array field of every key column of STATISTICS
+KEYS = {'pair': 'pair', 'algo': 'algorithm'}
+
+
+def factorize(values: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    np.unique with return_inverse, but only the first value of every run of equal values is sorted.
+    Trades of a backtest come in blocks of one (pair, algorithm), so only a few strings are compared.
+    :return: sorted unique values and index of every value in them
+    """
+    n = values.shape[0]
+    if n == 0:
+        return values[:0], np.zeros(0, dtype=np.int64)
+    starts = np.flatnonzero(np.concatenate(([True], values[1:] != values[:-1])))
+    uniques, inverse = np.unique(values[starts], return_inverse=True)
+    return uniques, np.repeat(inverse, np.diff(np.append(starts, n)))
+
+
+def trade_sums(trades: np.ndarray, key: str) -> Dict[str, list]:
+    """
+    :param key: pair or algorithm
+    :return: num_loss, num_profit, loss, profit and total duration in minutes of trades of every key
+    """
+    names, codes = factorize(trades[key])
+    income = incomes(trades)
+    weights = ((income < 0), (income >= 0), np.maximum(-income, 0), np.maximum(income, 0), trades['duration'] / 60)
+    sums = [np.bincount(codes, weights=weight, minlength=names.shape[0]) for weight in weights]
+    return {name: [int(sums[0][i]), int(sums[1][i]), float(sums[2][i]), float(sums[3][i]), float(sums[4][i])]
+            for i, name in enumerate(names.tolist())}
+
+
+def drawdown(income: np.ndarray, codes: np.ndarray, starts: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    :param income: income of trades sorted by group and exit time
+    :param starts: index of the first trade of every group
+    :return: cumulative income inside every group and the fall from its running peak, the peak starts at 0
+    """
+    total = np.cumsum(income)
+    curve = total - np.repeat(total[starts] - income[starts], np.diff(np.append(starts, income.shape[0])))
+    peak = np.maximum(pd.Series(curve).groupby(codes).cummax().to_numpy(), 0)
+    return curve, peak - curve
+
+
+class TradeStatistics:
+    """
+    Statistics of an array of TRADE_DTYPE grouped by pair, algorithm or both. Trades are reduced once
+    to sums of every (pair, algorithm), which add up to the sums of any coarser group, only drawdowns
+    need a pass over trades sorted by exit time for every grouping.
+    """
+    def __init__(self, trades: np.ndarray):
+        self.values = {key: factorize(trades[key]) for key in KEYS.values()}
+        start = trades['start_time'].astype(np.int64) / 1000
+        duration = trades['duration'].astype(float)
+        self.columns = {'start': start, 'end': start + duration, 'income': incomes(trades)}
+        self.by_exit = None
+
+        # group of every trade by (pair, algorithm), codes of the keys of every group
+        (pairs, pair_codes), (algos, algo_codes) = self.values['pair'], self.values['algorithm']
+        present = np.flatnonzero(np.bincount(pair_codes * algos.shape[0] + algo_codes,
+                                             minlength=pairs.shape[0] * algos.shape[0]))
+        mapping = np.zeros(pairs.shape[0] * algos.shape[0], dtype=np.int64)
+        mapping[present] = np.arange(present.shape[0])
+        self.codes = mapping[pair_codes * algos.shape[0] + algo_codes]
+        self.key_codes = {'pair': present // algos.shape[0], 'algorithm': present % algos.shape[0]}
+
+        n = present.shape[0]
+        income = self.columns['income']
+        returns = income / (trades['start_price'] * trades['quantity'])
+        weights = {'num_total': None, 'num_loss': income < 0, 'loss': np.maximum(-income, 0),
+                   'profit': np.maximum(income, 0), 'returns': returns, 'squares': returns ** 2,
+                   'downside': np.minimum(returns, 0) ** 2, 'duration': duration}
+        self.sums = {name: np.bincount(self.codes, weights=weight, minlength=n) for name, weight in weights.items()}
+        self.first = np.full(n, np.inf)
+        np.minimum.at(self.first, self.codes, start)
+        self.last = np.full(n, -np.inf)
+        np.maximum.at(self.last, self.codes, self.columns['end'])
+
+    def groups(self, keys: Tuple[str, ...]) -> Tuple[np.ndarray, List[tuple]]:
+        """
+        :param keys: fields of the trade array, no keys puts all trades into one group
+        :return: group of every (pair, algorithm) and key values of every group
+        """
+        codes = np.zeros(self.first.shape[0], dtype=np.int64)
+        for key in keys:
+            codes = codes * self.values[key][0].shape[0] + self.key_codes[key]
+        present, codes = np.unique(codes, return_inverse=True)
+        names = list()
+        for key in reversed(keys):
+            values = self.values[key][0]
+            names.append(values[present % values.shape[0]].tolist())
+            present = present // values.shape[0]
+        return codes, list(zip(*reversed(names))) if keys else [()] * present.shape[0]
+
+    def exit_order(self, codes: np.ndarray, n: int) -> np.ndarray:
+        """
+        :param n: number of groups
+        :return: order of trades by group and, inside a group, by exit time
+        """
+        end = self.columns['end']
+        if n > 1 and np.all(codes[1:] >= codes[:-1]) and np.all((codes[1:] > codes[:-1]) | (end[1:] >= end[:-1])):
+            return np.arange(codes.shape[0])
+        if self.by_exit is None:
+            self.by_exit = np.argsort(end)
+        if n == 1:
+            return self.by_exit
+        # stable sort keeps exit order inside a group, small codes are sorted by radix
+        codes = codes[self.by_exit]
+        return self.by_exit[np.argsort(codes.astype(np.uint16) if codes.max() < 2 ** 16 else codes, kind='stable')]
+
+    def statistics(self, keys: Tuple[str, ...] = ('pair', )) -> pd.DataFrame:
+        """
+        Sharpe and Sortino ratios are per trade, of incomes relative to the stake. Exposure is the time trades
+        of the group were open divided by the time from its first entry to its last exit, max_drawdown is
+        the largest fall of cumulative income from its peak.
+        :param keys: fields of the trade array that define groups, e.g. ('pair', 'algorithm')
+        :return: line of STATISTICS_COLUMNS of every group, indexed by keys
+        """
+        groups, names = self.groups(keys)
+        n = len(names)
+        sums = {name: np.bincount(groups, weights=values, minlength=n) for name, values in self.sums.items()}
+        first, last = np.full(n, np.inf), np.full(n, -np.inf)
+        np.minimum.at(first, groups, self.first)
+        np.maximum.at(last, groups, self.last)
+
+        max_drawdown = np.zeros(n)
+        if n:
+            codes = groups[self.codes]
+            order = self.exit_order(codes, n)
+            codes = codes[order]
+            starts = np.searchsorted(codes, np.arange(n))
+            max_drawdown = np.maximum.reduceat(drawdown(self.columns['income'][order], codes, starts)[1], starts)
+
+        num_total, num_loss, loss, profit = sums['num_total'], sums['num_loss'], sums['loss'], sums['profit']
+        with np.errstate(divide='ignore', invalid='ignore'):
+            mean = sums['returns'] / num_total
+            std = np.sqrt(np.maximum(sums['squares'] / num_total - mean ** 2, 0))
+            downside = np.sqrt(sums['downside'] / num_total)
+            lines = {'num_loss': num_loss.astype(np.int64), 'num_profit': (num_total - num_loss).astype(np.int64),
+                     'num_total': num_total.astype(np.int64),
+                     'ratio_num': np.round((num_total - num_loss) / num_total, 4),
+                     'loss': np.round(loss, 6), 'profit': np.round(profit, 6),
+                     'ratio': np.round(profit / (loss + profit), 4), 'total': np.round(profit - loss, 4),
+                     'av_duration': np.round(sums['duration'] / 60 / num_total, 4),
+                     'profit_factor': np.round(profit / loss, 4), 'max_drawdown': np.round(max_drawdown, 6),
+                     'sharpe': np.round(np.where(std > 0, mean / std, np.nan), 4),
+                     'sortino': np.round(np.where(downside > 0, mean / downside, np.nan), 4),
+                     'exposure': np.round(sums['duration'] / (last - first), 4)}
+        if len(keys) > 1:
+            index = pd.MultiIndex.from_tuples(names, names=keys)
+        else:
+            index = pd.Index([name[0] for name in names], name=keys[0]) if keys else pd.RangeIndex(n)
+        return pd.DataFrame(lines, index=index, columns=STATISTICS_COLUMNS)
+
+    def equity_curve(self, keys: Tuple[str, ...] = ('pair', 'algorithm')) -> pd.DataFrame:
+        """
+        :return: exit time, income, cumulative income and drawdown after every trade of every group
+        """
+        groups, names = self.groups(keys)
+        codes = groups[self.codes]
+        order = self.exit_order(codes, len(names)) if len(names) else np.zeros(0, dtype=np.int64)
+        codes = codes[order]
+        income = self.columns['income'][order]
+        curve, fall = drawdown(income, codes, np.searchsorted(codes, np.arange(len(names))))
+        frame = pd.DataFrame(index=pd.RangeIndex(codes.shape[0]))
+        for i, key in enumerate(keys):
+            values = self.values[key][0]
+            frame[key] = pd.Categorical.from_codes(np.searchsorted(values, [name[i] for name in names])[codes],
+                                                   values.tolist())
+        end = np.round(self.columns['end'][order] * 1000).astype(np.int64)
+        frame['time'] = pd.to_datetime(end, unit='ms', utc=True)
+        frame['income'] = income
+        frame['equity'] = curve
+        frame['drawdown'] = fall
+        return frame
+
+    def summary(self) -> pd.DataFrame:
+        """
+        :return: lines of the STATISTICS table, by (pair, algo), by pair, by algo and of all trades,
+        ALL stands for every pair or algo
+        """
+        frames = list()
+        for keys in (('pair', 'algo'), ('pair', ), ('algo', ), ()):
+            frame = self.statistics(tuple(KEYS[key] for key in keys))
+            frame = frame.reset_index(drop=not keys).rename(columns={'algorithm': 'algo'})
+            for key in KEYS:
+                if key not in keys:
+                    frame[key] = ALL
+            frames.append(frame[list(KEYS) + list(STATISTICS_COLUMNS)])
+        return pd.concat(frames, ignore_index=True)
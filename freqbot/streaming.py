@@ -0,0 +1,112 @@
+import numpy as np
+import pandas as pd
+from math import floor
+from typing import Union, List, Tuple, NoReturn
+
+from freqbot.tools import ms2datetime
+
+
+class StreamingBars:
+    """
+    Builds the bars of freqml's bars accessor one trade at a time with O(1) work per trade.
+    A trade belongs to bar floor(position / tick_size), where position is the number of trades before it for TB
+    and the running sum of amount (VB) or cost (DB) including it, exactly as the accessor groups a whole frame.
+    A TB bar is emitted by its last trade, its size is known. VB and DB bars are emitted when the first trade
+    of the next bar arrives, a trade can not tell that the running sum reaches the next bar before it is seen.
+    """
+    columns = ['open', 'high', 'low', 'close', 'amount', 'VWAP']
+    measures = {'TB': None, 'VB': 'amount', 'DB': 'cost'}
+
+    def __init__(self, tick_type: str, tick_size):
+        assert tick_type in self.measures
+        self.tick_type = tick_type
+        self.tick_size = tick_size
+        self.position = 0     # trades seen for TB, running sum of amount or cost otherwise
+        self.group = None     # number of the bar that is being built
+        self.open = self.high = self.low = self.close = None
+        self.amount = self.cost = 0.
+        self.amount_c = self.cost_c = 0.  # compensations of Kahan summation, groupby sums are compensated too
+        self.timestamp = None
+
+    @classmethod
+    def create(cls, tick_type: str, tick_size) -> Union['StreamingBars', None]:
+        """
+        :return: builder for tick types it supports and None for the rest
+        """
+        return cls(tick_type, tick_size) if tick_type in cls.measures else None
+
+    def next_group(self, amount: float, cost: float) -> int:
+        if self.tick_type == 'TB':
+            group = self.position // self.tick_size
+            self.position += 1
+            return group
+        self.position += amount if self.tick_type == 'VB' else cost
+        return floor(self.position / self.tick_size)
+
+    def start(self, group: int, price: float) -> NoReturn:
+        self.group = group
+        self.open = self.high = self.low = price
+        self.amount = self.cost = self.amount_c = self.cost_c = 0.
+
+    def bar(self) -> Tuple[int, list]:
+        return self.timestamp, [self.open, self.high, self.low, self.close, self.amount, self.cost / self.amount]
+
+    def update(self, price: float, amount: float, cost: float, timestamp: int) -> Union[Tuple[int, list], None]:
+        """
+        :param timestamp: time of the trade in ms
+        :return: timestamp and values of the bar completed by this trade or None
+        """
+        group = self.next_group(amount, cost)
+        completed = None
+        if group != self.group:
+            if self.group is not None:
+                completed = self.bar()
+            self.start(group, price)
+        if price > self.high:
+            self.high = price
+        if price < self.low:
+            self.low = price
+        self.close = price
+        self.timestamp = timestamp
+        y = amount - self.amount_c
+        t = self.amount + y
+        self.amount_c = (t - self.amount) - y
+        self.amount = t
+        y = cost - self.cost_c
+        t = self.cost + y
+        self.cost_c = (t - self.cost) - y
+        self.cost = t
+        if self.tick_type == 'TB' and self.position % self.tick_size == 0:
+            completed = self.bar()
+            self.group = None
+        return completed
+
+    def prime(self, trades: pd.DataFrame) -> NoReturn:
+        """
+        Continues a new builder after the bars that the accessor builds from trades:
+        counters are moved past the trades it put into bars and only the rest are fed to update.
+        For TB they are the trades of the unfinished last bar, for VB and DB the trades after the last
+        bar boundary, which update keeps in the open bar.
+        :param trades: trades in load_dataset format with RangeIndex
+        """
+        if trades.empty:
+            return
+        n = trades.shape[0]
+        if self.tick_type == 'TB':
+            used = n - n % self.tick_size
+            self.position = used
+        else:
+            positions = trades[self.measures[self.tick_type]].cumsum().to_numpy()
+            total = positions[-1]
+            used = int(np.searchsorted(positions, np.floor(total - total % self.tick_size), side='right'))
+            self.position = positions[used - 1] if used else 0.
+        for row in trades.iloc[used:][['price', 'amount', 'cost', 'timestamp']].itertuples(index=False):
+            self.update(row.price, row.amount, row.cost, row.timestamp)
+
+    def frame(self, bars: List[Tuple[int, list]]) -> pd.DataFrame:
+        """
+        :param bars: completed bars returned by update
+        :return: bars in the format of the accessor
+        """
+        index = pd.Index(ms2datetime(pd.Series([timestamp for timestamp, _ in bars])), name='datetime')
+        return pd.DataFrame([values for _, values in bars], columns=self.columns, index=index)
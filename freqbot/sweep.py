@@ -0,0 +1,173 @@
+import numpy as np
+import os
+import json
+import inspect
+import itertools
+import concurrent.futures
+from collections import deque
+from typing import List, Dict, NoReturn
+
+from freqbot import backtestingbot
+from freqbot.backtestingbot import BacktestingBot, init_worker
+from freqbot.algos import BasicAlgorithm
+from freqbot.database import SummaryTable
+from freqbot.shared import SharedFrame, SharedFrames
+from freqbot.logging import get_logger, worker_queue
+
+# parameters that only change exits, candidates that differ only in them share buy and sell signals
+EXIT_PARAMETERS = ('roi', 'stoploss')
+
+
+def grid(space: Dict[str, list]) -> List[dict]:
+    """
+    :return: every combination of parameter values
+    """
+    names = list(space)
+    return [dict(zip(names, values)) for values in itertools.product(*(space[name] for name in names))]
+
+
+def random_search(space: dict, n: int, seed: int = None) -> List[dict]:
+    """
+    :param space: list of values to choose from or (low, high) range for every parameter, int bounds give ints
+    :return: n random candidates
+    """
+    rng = np.random.default_rng(seed)
+
+    def sample(values):
+        if isinstance(values, tuple):
+            low, high = values
+            if isinstance(low, int) and isinstance(high, int):
+                return int(rng.integers(low, high + 1))
+            return float(rng.uniform(low, high))
+        return values[rng.integers(len(values))]
+
+    return [{name: sample(values) for name, values in space.items()} for _ in range(n)]
+
+
+def make_algorithm(algorithm_class: type, params: dict) -> BasicAlgorithm:
+    """
+    Parameters of the constructor are passed to it, the rest are set as attributes (roi, stoploss, ...)
+    """
+    arguments = inspect.signature(algorithm_class.__init__).parameters
+    algo = algorithm_class(**{name: value for name, value in params.items() if name in arguments})
+    for name, value in params.items():
+        if name not in arguments:
+            setattr(algo, name, value)
+    return algo
+
+
+def signal_key(params: dict) -> str:
+    return json.dumps({name: value for name, value in params.items() if name not in EXIT_PARAMETERS},
+                      sort_keys=True, default=str)
+
+
+def run_sweep_task(algos: List[BasicAlgorithm], pair: SharedFrame, stake_amount: int) -> List[list]:
+    """
+    Backtests candidates that share signals on one pair, the signals are computed once for all of them
+    :return: num_loss, num_profit, loss, profit and total duration of trades of every candidate
+    """
+    bot = backtestingbot.worker_bot
+    frame = pair.attach()
+    signals = algos[0].signals(frame) if not frame.empty else None
+    results = list()
+    for algo in algos:
+        collector = bot.backtest_algo_pair_vectorized(algo, frame, stake_amount, pair.name, signals)
+        results.append(collector.totals())
+    return results
+
+
+class ParameterSweep:
+    """
+    Backtests many settings of one algorithm class on the same pairs. Bars are loaded once per tick type
+    and shared with worker processes, and candidates that differ only in roi and stoploss share the indicators
+    and signals computed for each pair. Tasks are sent pair by pair, so a candidate that loses clearly
+    on the first pairs is pruned before the rest of them.
+    """
+    def __init__(self, bot: BacktestingBot, algorithm_class: type, candidates: List[dict], stake_amount: int = 10,
+                 prune_loss: float = None, min_pairs: int = 1):
+        """
+        :param candidates: parameters of every candidate, see grid and random_search
+        :param prune_loss: a candidate whose average loss per tested pair is larger than prune_loss * stake_amount
+        is not tested on the remaining pairs, None disables pruning
+        :param min_pairs: number of pairs a candidate is tested on before it can be pruned
+        """
+        self.bot = bot
+        self.algorithm_class = algorithm_class
+        self.candidates = candidates
+        self.stake_amount = stake_amount
+        self.prune_loss = prune_loss
+        self.min_pairs = min_pairs
+        self.lines: List[dict] = list()
+        self.sums: List[list] = list()
+
+    def should_prune(self, candidate: int) -> bool:
+        pairs = self.lines[candidate]['pairs']
+        num_loss, num_profit, loss, profit, duration = self.sums[candidate]
+        return self.prune_loss is not None and pairs >= self.min_pairs and \
+            profit - loss < -self.prune_loss * self.stake_amount * pairs
+
+    def run(self, pairs: List[str], days: int = 3, override: bool = False, workers: int = None,
+            load_workers: int = None, cache_bars: bool = True, filename: str = 'sweep') -> List[dict]:
+        """
+        :param workers: number of processes that run backtests
+        :return: lines of all candidates, the most profitable first and pruned ones after them
+        """
+        bot = self.bot
+        bot.logger = get_logger('backtest')
+        algos = [make_algorithm(self.algorithm_class, params) for params in self.candidates]
+        bot.set_metadata(pairs, self.stake_amount, algos)
+        bot.get_historical_data(pairs, days, override, load_workers, cache_bars)
+        bot.logger.info('ALL DATA WAS DOWNLOADED AND PROCESSED TO NEEDED FORMAT')
+
+        groups: Dict[str, List[int]] = dict()
+        for candidate, params in enumerate(self.candidates):
+            groups.setdefault(signal_key(params), list()).append(candidate)
+        self.lines = [{'candidate': candidate, 'params': json.dumps(params, default=str), 'pairs': 0, 'pruned': 0}
+                      for candidate, params in enumerate(self.candidates)]
+        self.sums = [[0] * 5 for _ in self.candidates]
+        results = SummaryTable(filename, 'SWEEP', {'candidate': 'INTEGER NOT NULL PRIMARY KEY',
+                                                   'params': 'VARCHAR NOT NULL', 'pairs': 'INTEGER NOT NULL',
+                                                   'pruned': 'INTEGER NOT NULL'})
+        workers = workers or os.cpu_count()
+
+        with SharedFrames() as shared:
+            tick_pair_frames = {tick_type: [shared.publish(pair) for pair in frames]
+                                for tick_type, frames in bot.tick_pair_frames.items()}
+            tasks = deque((i, group) for i in range(len(pairs)) for group in groups.values())
+            initargs = (bot.worker_copy(), worker_queue(bot.logger.name))
+            with concurrent.futures.ProcessPoolExecutor(max_workers=workers, initializer=init_worker,
+                                                        initargs=initargs) as executor:
+                running: Dict[concurrent.futures.Future, List[int]] = dict()
+                while tasks or running:
+                    # few tasks are in flight, so pruning takes effect before the next pairs are sent
+                    while tasks and len(running) < 2 * workers:
+                        i, group = tasks.popleft()
+                        alive = [candidate for candidate in group if not self.lines[candidate]['pruned']]
+                        if not alive:
+                            continue
+                        algo = algos[alive[0]]
+                        pair = tick_pair_frames[algo.tick_type + '_' + str(algo.tick_size)][i]
+                        future = executor.submit(run_sweep_task, [algos[candidate] for candidate in alive], pair,
+                                                 self.stake_amount)
+                        running[future] = alive
+                    done, _ = concurrent.futures.wait(running, return_when=concurrent.futures.FIRST_COMPLETED)
+                    for future in done:
+                        for candidate, result in zip(running.pop(future), future.result()):
+                            self.update_candidate(candidate, result, len(pairs), results)
+        results.close()
+
+        lines = sorted(self.lines, key=lambda line: (line['pruned'], -line['total']))
+        pruned = sum(line['pruned'] for line in lines)
+        bot.logger.info(str(len(lines)) + ' CANDIDATES WERE TESTED, ' + str(pruned) + ' OF THEM WERE PRUNED')
+        return lines
+
+    def update_candidate(self, candidate: int, result: list, n_pairs: int, results: SummaryTable) -> NoReturn:
+        line = self.lines[candidate]
+        if line['pruned']:
+            return
+        line['pairs'] += 1
+        self.sums[candidate] = [total + value for total, value in zip(self.sums[candidate], result)]
+        if line['pairs'] < n_pairs and self.should_prune(candidate):
+            line['pruned'] = 1
+        if line['pairs'] == n_pairs or line['pruned']:
+            self.lines[candidate] = results.write(line, self.sums[candidate])
@@ -1,4 +1,9 @@
+import time
 import numpy as np
+import pandas as pd
+
+# timezone of datetimes of trades and bars, the one freqml uses
+TIMEZONE = "Europe/Chisinau"
 
 
 def r(value: float, precision: int = 4) -> float:
@@ -9,5 +14,47 @@ def time2stamp(datetime) -> int:
     return int(datetime.value / 1000000)
 
 
+def ctime2stamp(ctime: str) -> int:
+    """
+    :param ctime: result of time.ctime, local time of this machine
+    :return: ms since epoch
+    """
+    return int(time.mktime(time.strptime(ctime))) * 1000
+
+
 def timedelta2seconds(delta: np.timedelta64) -> int:
     return np.array([delta], dtype="timedelta64[s]")[0].item().total_seconds()
+
+
+def index2nanoseconds(index) -> np.ndarray:
+    """
+    :param index: DatetimeIndex of a bar frame
+    :return: int64 nanoseconds passed since the first bar, whatever resolution the index is stored in
+    """
+    return (index - index[0]).to_numpy(dtype="timedelta64[ns]").astype(np.int64)
+
+
+def index2stamps(index) -> np.ndarray:
+    """
+    :param index: DatetimeIndex, naive or tz-aware
+    :return: int64 nanoseconds since epoch
+    """
+    if index.tz is not None:
+        index = index.tz_convert(None)
+    return index.values.astype("datetime64[ns]").view(np.int64)
+
+
+def stamps2index(stamps: np.ndarray, tz=None):
+    """
+    Inverse of index2stamps
+    """
+    index = pd.DatetimeIndex(stamps.view("datetime64[ns]"))
+    return index.tz_localize("UTC").tz_convert(tz) if tz is not None else index
+
+
+def ms2datetime(timestamps):
+    """
+    :param timestamps: Series of trade timestamps in ms
+    :return: Series of datetimes in the timezone freqml uses for trades
+    """
+    return pd.to_datetime(timestamps, unit="ms", utc=True).dt.tz_convert(TIMEZONE)
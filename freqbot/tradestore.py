@@ -0,0 +1,164 @@
+import numpy as np
+import pandas as pd
+import glob
+import os
+import shutil
+import time
+from itertools import takewhile
+from typing import Iterable, Union, NoReturn
+
+from freqbot.tools import ms2datetime
+
+DAY = 24 * 60 * 60 * 1000
+
+
+class TradeSource:
+    """
+    Where TradeStore takes aggregate trades from, they are raw dicts as the exchange sends them (a, p, q, T, ...)
+    """
+    def now(self) -> int:
+        return int(time.time() * 1000)
+
+    def trades(self, pair: str, start_time: int = None, last_id: int = None) -> Iterable[dict]:
+        """
+        :param start_time: timestamp in ms of the first trade, used when last_id is None
+        :param last_id: id of the last known trade, only trades after it are returned
+        """
+        raise NotImplementedError
+
+
+class BinanceSource(TradeSource):
+    def __init__(self, client):
+        self.client = client
+
+    def trades(self, pair: str, start_time: int = None, last_id: int = None) -> Iterable[dict]:
+        if last_id is not None:
+            return self.client.aggregate_trade_iter(symbol=pair, last_id=last_id)
+        return self.client.aggregate_trade_iter(symbol=pair, start_str=start_time)
+
+
+class LocalSource(TradeSource):
+    """
+    Serves trades of a frame in load_dataset format instead of the exchange, its last trade is "now"
+    """
+    def __init__(self, trades: pd.DataFrame):
+        self.data = trades.reset_index(drop=True)
+
+    def now(self) -> int:
+        return int(self.data['timestamp'].iloc[-1]) if not self.data.empty else 0
+
+    def trades(self, pair: str, start_time: int = None, last_id: int = None) -> Iterable[dict]:
+        if last_id is not None:
+            rows = self.data.loc[self.data['id'] > last_id]
+        else:
+            rows = self.data.loc[self.data['timestamp'] >= start_time]
+        for row in rows.itertuples(index=False):
+            yield {'a': row.id, 'p': row.price, 'q': row.amount, 'T': row.timestamp}
+
+
+class TradeStore:
+    """
+    Append-only store of aggregate trades of one pair in historical_data/trades/<pair>/.
+    Trades are kept as chunks of .npy files named by their first id, update fetches only trades
+    after the last stored id (and the missing beginning if a longer window is requested).
+    """
+    columns = ['id', 'price', 'amount', 'timestamp']
+
+    def __init__(self, path: str, pair: str, source: TradeSource, chunk_size: int = 1000000,
+                 max_chunks: int = 32):
+        self.path = os.path.join(path, 'trades', pair)
+        self.pair = pair
+        self.source = source
+        self.chunk_size = chunk_size
+        self.max_chunks = max_chunks
+        os.makedirs(self.path, exist_ok=True)
+
+    def chunks(self) -> list:
+        return sorted(glob.glob(os.path.join(self.path, '*.npy')))
+
+    def load_chunk(self, filename: str) -> np.ndarray:
+        return np.load(filename, mmap_mode='r')
+
+    def first(self) -> Union[np.ndarray, None]:
+        chunks = self.chunks()
+        return self.load_chunk(chunks[0])[0] if chunks else None
+
+    def last(self) -> Union[np.ndarray, None]:
+        chunks = self.chunks()
+        return self.load_chunk(chunks[-1])[-1] if chunks else None
+
+    def write_chunk(self, rows: np.ndarray) -> NoReturn:
+        filename = os.path.join(self.path, '{:020d}.npy'.format(int(rows[0, 0])))
+        with open(filename + '.tmp', 'wb') as fh:
+            np.save(fh, rows)
+        os.replace(filename + '.tmp', filename)
+
+    def append(self, trades: Iterable[dict]) -> int:
+        """
+        :return: number of appended trades
+        """
+        n = 0
+        rows = list()
+        for trade in trades:
+            rows.append((trade['a'], trade['p'], trade['q'], trade['T']))
+            if len(rows) == self.chunk_size:
+                self.write_chunk(np.array(rows, dtype=float))
+                n += len(rows)
+                rows = list()
+        if rows:
+            self.write_chunk(np.array(rows, dtype=float))
+            n += len(rows)
+        return n
+
+    def compact(self) -> NoReturn:
+        chunks = self.chunks()
+        if len(chunks) <= self.max_chunks:
+            return
+        rows = np.concatenate([self.load_chunk(filename) for filename in chunks])
+        self.write_chunk(rows)
+        for filename in chunks[1:]:
+            os.remove(filename)
+
+    def clear(self) -> NoReturn:
+        shutil.rmtree(self.path, ignore_errors=True)
+        os.makedirs(self.path, exist_ok=True)
+
+    def update(self, days: int) -> int:
+        """
+        Fetches trades that are missing to cover the last days
+        :return: number of fetched trades
+        """
+        start_time = self.source.now() - days * DAY
+        first, last = self.first(), self.last()
+        if last is not None and last[3] < start_time:
+            # everything stored is older than the window, fetching after it would be longer than a cold start
+            self.clear()
+            first = last = None
+        if last is None:
+            n = self.append(self.source.trades(self.pair, start_time=start_time))
+        else:
+            n = 0
+            if first[3] > start_time:
+                trades = self.source.trades(self.pair, start_time=start_time)
+                n += self.append(takewhile(lambda trade: trade['a'] < first[0], trades))
+            n += self.append(self.source.trades(self.pair, last_id=int(last[0])))
+        self.compact()
+        return n
+
+    def window(self, days: int) -> pd.DataFrame:
+        """
+        :return: trades of the last days before the last stored trade, in load_dataset format
+        """
+        chunks = [self.load_chunk(filename) for filename in self.chunks()]
+        if not chunks:
+            return pd.DataFrame(columns=self.columns + ['datetime', 'cost'])
+        start_time = chunks[-1][-1, 3] - days * DAY
+        chunks = [chunk for chunk in chunks if chunk[-1, 3] >= start_time]
+        rows = np.concatenate(chunks)
+        rows = rows[np.searchsorted(rows[:, 3], start_time):]
+        data = pd.DataFrame(rows, columns=self.columns)
+        data['id'] = data['id'].astype(np.int64)
+        data['timestamp'] = data['timestamp'].astype(np.int64)
+        data['datetime'] = ms2datetime(data['timestamp'])
+        data['cost'] = data['price'] * data['amount']
+        return data
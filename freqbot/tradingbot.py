@@ -1,10 +1,11 @@
-import freqml as fm
 import pandas as pd
 import numpy as np
 import time
 import os
 import sys
-from typing import NoReturn, Union
+import json
+import logging
+from typing import Callable, NoReturn, Union
 from freqml import *
 
 from binance.websockets import BinanceSocketManager
@@ -12,18 +13,30 @@ from binance.client import Client
 from binance.exceptions import BinanceAPIException
 
 from freqbot.database import DataHandler
+from freqbot.records import TradeRecord
+from freqbot.barstore import BarStore
+from freqbot.tradestore import TradeStore, TradeSource, BinanceSource
+from freqbot.simulation import SimulatedExchange, SimulatedSocketManager
+from freqbot.streaming import StreamingBars
+from freqbot.metrics import MetricsRegistry
+from freqbot.roi import RoiSchedule
 from freqbot.algos import BasicAlgorithm
-from freqbot.tools import time2stamp
-from freqbot.logging import get_logger
+from freqbot.tools import time2stamp, ms2datetime
+from freqbot.logging import get_logger, RateLimiter
 
 
 class OrderMetadata:
-    def __init__(self):
+    def __init__(self, clock: Callable[[], float] = None):
+        """
+        :param clock: seconds since epoch, e.g. time of the replayed trades of a dry run, real time by default
+        """
+        self.clock = clock
         self.quantity = None
         self.start_price = None
         self.end_price = None
         self.pair = None
         self.ctime = None
+        self.open_time = None   # ms since epoch
         self.start_time = None
         self.end_time = None
         self.sell_reason = None
@@ -42,12 +55,20 @@ class OrderMetadata:
         avg_price = client.get_avg_price(symbol='BNBUSDT')
         self.bnb_price = float(avg_price['price'])
 
+    def now(self) -> float:
+        """
+        :return: seconds that durations of trades are measured in
+        """
+        return self.clock() if self.clock is not None else time.perf_counter()
+
     def set_time(self, action: str) -> NoReturn:
         if action == 'BUY' and not self.start_time:
-            self.start_time = time.perf_counter()
-            self.ctime = time.ctime()
+            epoch = self.clock() if self.clock is not None else time.time()
+            self.start_time = self.now()
+            self.ctime = time.ctime(epoch)
+            self.open_time = int(epoch * 1000)
         else:
-            self.end_time = time.perf_counter()
+            self.end_time = self.now()
 
     def set_start_price(self, start_price: float) -> NoReturn:
         self.start_price = start_price
@@ -116,6 +137,7 @@ class OrderMetadata:
         self.end_price = None
         self.pair = None
         self.ctime = None
+        self.open_time = None
         self.start_time = None
         self.end_time = None
         self.sell_reason = None
@@ -124,11 +146,28 @@ class OrderMetadata:
         self.limit_type = None
 
 
+def load_history(source: TradeSource, pair: str, days: int, path: str, override: bool) -> pd.DataFrame:
+    """
+    Brings the trade store of the pair up to date and returns its last days in load_dataset format
+    :param override: forget stored trades and fetch the whole window again
+    """
+    store = TradeStore(path, pair, source)
+    if override:
+        store.clear()
+    store.update(days)
+    return store.window(days)
+
+
 class TradingBot:
-    def __init__(self, key: str, secret: str):
-        self.client = Client(key, secret)
+    trade_columns = ['id', 'price', 'amount', 'timestamp', 'cost']
+
+    def __init__(self, key: str, secret: str, buffer_size: int = 100000, client: Client = None):
+        self.client = client if client is not None else Client(key, secret)
         self.algorithm: Union[BasicAlgorithm, None] = None
-        self.data = pd.DataFrame()
+        self.data = BarStore(buffer_size)  # trades that are not in bars yet, for tick types without StreamingBars
+        self.bars: Union[StreamingBars, None] = None
+        self.last_id = None
+        self.trade_source: TradeSource = BinanceSource(self.client)
         self.request = dict()
         self.order = None
 
@@ -137,14 +176,20 @@ class TradingBot:
         self.stake_amount = None
         self.price = None
         self.is_trading = False
+        self.pending = None  # action of the sent order until its execution report arrives
         self.lot_precision = None
         self.price_precision = None
         self.roi = dict()
         self.stoploss = None
+        self.roi_schedule: Union[RoiSchedule, None] = None
 
         # some helpers
         self.data_handler: Union[DataHandler, None] = None
         self.logger = None
+        self.registry = MetricsRegistry()
+        self.rate_limiter = RateLimiter()  # of messages that may come with every trade or bar
+        self.received = None  # perf_counter_ns when the last live message arrived
+        self.order_sent = None  # perf_counter_ns when the pending order was sent
 
     def create_request(self, pair: str) -> NoReturn:
         self.request['symbol'] = pair
@@ -173,27 +218,28 @@ class TradingBot:
         self.roi = {float(key): value for key, value in self.algorithm.roi.items()}
         self.roi[np.inf] = 0
         self.stoploss = self.algorithm.stoploss
+        self.roi_schedule = RoiSchedule(self.roi, self.stoploss)
         self.create_request(pair)
         self.meta.set_bnb_price(self.client)
         self.meta.set_algorithm_name(self.algorithm)
 
     def data_drop(self, state) -> NoReturn:
-        self.data = self.data.drop(self.data.loc[self.data["timestamp"] <= time2stamp(state.index[-1])].index)
+        self.data.discard(np.searchsorted(self.data.array('timestamp'), time2stamp(state.index[-1]), side='right'))
+
+    def trades_frame(self) -> pd.DataFrame:
+        trades = self.data.frame()
+        trades['datetime'] = ms2datetime(trades['timestamp'])
+        return trades
 
     def roi_stoploss_check(self) -> bool:
-        diff = time.perf_counter() - self.meta.start_time
-        keys = np.array(list(self.roi.keys()))
-        key = np.min(keys[keys * 60 - diff > 0])
-        profit_price = self.meta.start_price * (1 + self.roi[key])
-        if self.price > profit_price:
-            self.meta.set_sell_reason('ROI')
-            self.logger.info('ROI WAS REACHED')
-            return True
-        if self.price < self.meta.start_price * (1 + self.stoploss):
-            self.meta.set_sell_reason('STOPLOSS')
-            self.logger.info('STOPLOSS WAS REACHED')
-            return True
-        return False
+        diff = self.meta.now() - self.meta.start_time
+        found = self.roi_schedule.check(self.meta.start_price, self.price, diff)
+        if found is None:
+            return False
+        sell_reason = found[1]
+        self.meta.set_sell_reason(sell_reason)
+        self.logger.info(sell_reason + ' WAS REACHED')
+        return True
 
     @staticmethod
     def process_message(message) -> dict:
@@ -201,8 +247,8 @@ class TradingBot:
         message["id"] = message.pop("a")
         message["amount"] = message.pop("q")
         message["timestamp"] = message.pop("T")
-        message["price"] = pd.to_numeric(message["price"])
-        message["amount"] = pd.to_numeric(message["amount"])
+        message["price"] = float(message["price"])
+        message["amount"] = float(message["amount"])
         message["cost"] = message["price"] * message["amount"]
         message.pop("E", None)
         message.pop("e", None)
@@ -213,70 +259,147 @@ class TradingBot:
         del message["M"]
         return message
 
+    def next_state(self, messages: list) -> Union[pd.DataFrame, None]:
+        """
+        :return: bars completed by the new trades, None or an empty frame if there are none
+        """
+        if self.bars is not None:
+            bars = list()
+            for message in messages:
+                bar = self.bars.update(message['price'], message['amount'], message['cost'], message['timestamp'])
+                if bar is not None:
+                    bars.append(bar)
+            return self.bars.frame(bars) if bars else None
+        self.data.extend(messages)
+        return getattr(self.trades_frame().bars, self.algorithm.tick_type)(self.algorithm.tick_size)
+
     def update(self, message, act: bool) -> NoReturn:
-        self.data = self.data.append(message, ignore_index=True)
-        state = getattr(self.data.bars, self.algorithm.tick_type)(self.algorithm.tick_size)
-        if not state.empty:
+        messages = [message] if isinstance(message, dict) else message
+        if not messages:
+            return
+        self.last_id = int(messages[-1]['id'])
+        start = time.perf_counter_ns()
+        state = self.next_state(messages)
+        if act:
+            self.registry.observe('bar_build_seconds', time.perf_counter_ns() - start)
+        if state is not None and not state.empty:
+            start = time.perf_counter_ns()
             self.algorithm.set_state(state)
-            self.logger.info('STATE IS UPDATED')
+            self.rate_limiter.log(self.logger, logging.DEBUG, 'STATE IS UPDATED')
             action = self.algorithm.action(self.is_trading)
-            if act and action:
+            if act:
+                end = time.perf_counter_ns()
+                self.registry.observe('indicator_seconds', end - start)
+                self.registry.observe('decision_seconds', end - (self.received or start))
+                self.registry.inc('bars_total', state.shape[0])
+            if act and action and not self.pending:
                 if action == 'SELL':
                     self.meta.set_sell_reason('SELL SIGNAL')
                 self.act(action, self.algorithm.order_type)
+            if self.bars is None:
+                self.data_drop(state)
+
+    def set_history(self, history: pd.DataFrame) -> NoReturn:
+        """
+        Gives bars of the loaded trades to the algorithm and prepares building of bars from the next trades
+        :param history: trades in load_dataset format
+        """
+        state = getattr(history.bars, self.algorithm.tick_type)(self.algorithm.tick_size)
+        self.algorithm.set_state(state)
+        self.last_id = int(history['id'].iloc[-1])
+        self.bars = StreamingBars.create(self.algorithm.tick_type, self.algorithm.tick_size)
+        if self.bars is not None:
+            self.bars.prime(history)
+        else:
+            self.data.extend(history[self.trade_columns])
             self.data_drop(state)
 
     def get_historical_data(self, pair: str, days: int, override: bool) -> NoReturn:
         path = os.path.abspath(__file__)
         path = "/".join(path.split('/')[:-2]) + '/historical_data/'
-        self.data = fm.load_dataset(client=self.client,
-                                    pair=pair,
-                                    days=days,
-                                    path=path,
-                                    override=override)
-
-        state = getattr(self.data.bars, self.algorithm.tick_type)(self.algorithm.tick_size)
-
-        self.algorithm.set_state(state)
-
-        last_id = self.data.iloc[-1, 0]
-        self.data_drop(state)
+        history = load_history(self.trade_source, pair, days, path, override)
+        self.set_history(history)
 
         # cycle below is just to minimize lag that occurs because of loading dataset
         for i in range(5):
-            if not self.data.empty:
-                last_id = self.data.iloc[-1, 0]
-            agg_trades = self.client.aggregate_trade_iter(symbol=pair, last_id=last_id)
+            agg_trades = self.client.aggregate_trade_iter(symbol=pair, last_id=self.last_id)
             agg_trades = list(agg_trades)
             messages = [self.process_message(message) for message in agg_trades]
             self.update(messages, False)
 
+    def order_filled(self) -> NoReturn:
+        if self.order_sent is not None:
+            self.registry.observe('order_round_trip_seconds', time.perf_counter_ns() - self.order_sent)
+            self.order_sent = None
+        self.registry.inc('fills_total')
+
+    def write_record(self, record: TradeRecord) -> NoReturn:
+        start = time.perf_counter_ns()
+        self.data_handler.update(record)
+        self.registry.observe('db_write_seconds', time.perf_counter_ns() - start)
+        self.registry.inc('records_total')
+
+    def follow_order(self, message: dict) -> bool:
+        """
+        Updates metadata, is_trading and pending with an execution report
+        :return: True if the report closed the trade, the caller writes its record
+        """
+        self.meta.add_socket_order(message)
+        side, status = message['S'], message['X']
+        if status in ['CANCELED', 'REJECTED', 'EXPIRED']:
+            # is_trading is kept, a BUY that was partly filled still opened the trade
+            self.logger.warning(side + ' ORDER WAS ' + status)
+            if side == 'BUY' and not self.is_trading:
+                self.meta.flush()
+            self.pending = None
+            return False
+        if side == 'BUY':
+            if status in ['PARTIALLY_FILLED', 'FILLED']:
+                self.is_trading = True
+            if status == 'FILLED':
+                self.order_filled()
+                self.pending = None
+            return False
+        if status == 'FILLED':
+            self.order_filled()
+            self.is_trading = False
+            self.pending = None
+            return True
+        return False
+
     def handle_order(self, message) -> NoReturn:
         if message['e'] == 'executionReport':
-            self.meta.add_socket_order(message)
-            if message['S'] == 'BUY':
-                self.is_trading = True
-            elif message['S'] == 'SELL' and message['X'] == 'FILLED':
-                self.data_handler.update(vars(self.meta))
+            if self.follow_order(message):
+                record = TradeRecord.from_metadata(self.meta)
+                self.write_record(record)
                 self.logger.info('DATABASE WAS UPDATED')
-                self.logger.debug(vars(self.meta))
+                self.logger.debug(record)
                 self.meta.flush()
                 self.meta.set_bnb_price(self.client)
-                self.is_trading = False
         elif message['e'] == 'error':
             self.logger.error('HANDLE ORDER ERROR ' + message['m'])
             sys.exit()
 
     def handle_message(self, message) -> NoReturn:
-        message = self.process_message(message)
+        received = time.perf_counter_ns()
+        self.registry.inc('messages_total')
+        self.on_trade(self.process_message(message), received)
+
+    def on_trade(self, message: dict, received: int = None) -> NoReturn:
+        """
+        :param message: trade after process_message, it is not changed so several bots can share it
+        :param received: perf_counter_ns when the message arrived
+        """
+        self.received = received if received is not None else time.perf_counter_ns()
         self.price = float(message["price"])
 
         # handling roi or stoploss case
-        if self.is_trading:
+        if self.is_trading and not self.pending:
             if self.roi_stoploss_check():
                 self.act('SELL', 'MARKET')
 
         self.update(message, True)
+        self.registry.observe('message_seconds', time.perf_counter_ns() - self.received)
 
     def make_limit_request(self, action: str) -> NoReturn:
         self.request['side'] = action
@@ -307,9 +430,15 @@ class TradingBot:
         try:
             self.logger.info(action + ' ' + type_order + ' ORDER WAS SENT')
             self.logger.debug(self.request)
+            # the execution report may be handled before create_order returns, it clears pending and order_sent
+            self.pending = action
+            sent = self.order_sent = time.perf_counter_ns()
             self.order = self.client.create_order(** self.request)
+            self.registry.observe('order_request_seconds', time.perf_counter_ns() - sent)
+            self.registry.inc('orders_total')
             self.logger.debug(self.order)
         except BinanceAPIException as e:
+            self.pending = None
             self.logger.error(e)
             sys.exit()
         self.meta.add_order(self.order)
@@ -338,3 +467,45 @@ class TradingBot:
         bm_trades = BinanceSocketManager(self.client)
         conn_key = bm_trades.start_aggtrade_socket(pair, self.handle_message)
         bm_trades.start()
+
+    def listen(self, pair: str, socket_manager) -> NoReturn:
+        """
+        Subscribes to trades of the pair and to execution reports, returns when the socket manager stops
+        """
+        socket_manager.start_user_socket(self.handle_order)
+        socket_manager.start_aggtrade_socket(pair, self.handle_message)
+        socket_manager.start()
+
+    def dry_run(self, pair: str, days: int, algorithm: BasicAlgorithm, replay_days: float = 1,
+                speed: float = None, stake_amount: int = 10) -> NoReturn:
+        """
+        Paper trading on trades recorded in historical_data/, nothing is sent to the exchange. Trades of the
+        last replay_days are replayed through the live code path and orders are filled by SimulatedExchange,
+        ROI and durations of trades follow the time of the replayed trades.
+        :param pair: pair to trade on
+        :param days: number of days of history before the replayed trades
+        :param algorithm: algorithm to trade on
+        :param replay_days: number of days of replayed trades
+        :param speed: seconds of trades replayed per second, None replays as fast as possible
+        :param stake_amount: amount of one stake
+        :return: dry_run has no return but it saves logs and trades to databases/dry_run.db
+        """
+        self.logger = get_logger('dry_run')
+        exchange = SimulatedExchange.recorded([pair], days, replay_days)
+        self.client = exchange
+        self.trade_source = exchange
+        self.meta.clock = exchange.clock
+        self.set_metadata(pair, stake_amount, algorithm)
+        self.data_handler = DataHandler('dry_run')
+        self.set_history(exchange.history(pair))
+        self.logger.info(pair + ' recorded data for ' + str(days) + ' days was processed')
+
+        socket_manager = SimulatedSocketManager(exchange, speed)
+        self.listen(pair, socket_manager)
+        self.data_handler.close()
+        self.logger.info('REPLAYED ' + str(socket_manager.replayed) + ' TRADES IN '
+                         + '{:.1f}'.format(socket_manager.seconds) + ' SECONDS, '
+                         + str(len(exchange.orders) - len(exchange.open_orders)) + ' ORDERS WERE FILLED, '
+                         + str(len(exchange.open_orders)) + ' ARE OPEN')
+        self.logger.info('METRICS ' + json.dumps(self.registry.snapshot()))
+        self.registry.close()
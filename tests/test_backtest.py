@@ -0,0 +1,78 @@
+import logging
+import numpy as np
+import pandas as pd
+import pytest
+
+from freqbot import BacktestingBot
+from freqbot.algos import BasicAlgorithm
+from freqbot.benchmark import OfflineClient
+from freqbot.tools import ms2datetime
+
+
+class Scripted(BasicAlgorithm):
+    """
+    Buys on bars whose signal column is set, exits on ROI, stoploss or the next signal
+    """
+    def update_indicators(self, dataframe: pd.DataFrame) -> pd.DataFrame:
+        return dataframe
+
+    def buy_trend(self, dataframe: pd.DataFrame) -> bool:
+        dataframe['buy'] = dataframe['signal'].astype(int)
+        return dataframe['buy'].iat[-1] == 1
+
+
+def make_bars(timestamps, close, signal) -> pd.DataFrame:
+    close = np.asarray(close, dtype=float)
+    index = pd.DatetimeIndex(ms2datetime(pd.Series(timestamps)), name='datetime')
+    return pd.DataFrame({'open': close, 'high': close, 'low': close, 'close': close, 'amount': 1., 'VWAP': close,
+                         'signal': np.asarray(signal, dtype=bool)}, index=index)
+
+
+def run(bars: pd.DataFrame, roi: dict, stoploss: float = -0.03):
+    trades = list()
+    for vectorized in [False, True]:
+        bot = BacktestingBot('', '', client=OfflineClient())
+        bot.logger = logging.getLogger('test_backtest')
+        algorithm = Scripted('TB', 20)
+        algorithm.roi, algorithm.stoploss = dict(roi), stoploss
+        bot.set_metadata(['AAA'], 10, [algorithm])
+        test = bot.backtest_algo_pair_vectorized if vectorized else bot.backtest_algo_pair
+        trades.append(test(algorithm, bars, 10, 'AAA').array())
+    return trades
+
+
+def assert_same(loop: np.ndarray, vectorized: np.ndarray) -> None:
+    assert loop.shape == vectorized.shape
+    for field in loop.dtype.names:
+        if loop.dtype[field].kind == 'f':
+            np.testing.assert_allclose(vectorized[field], loop[field], rtol=1e-12, err_msg=field)
+        else:
+            assert (vectorized[field] == loop[field]).all(), field
+
+
+def test_roi_boundaries():
+    # entries are 600 ms after a whole second, so flooring every bar time to seconds separately would
+    # count 59.999 s and 59.6 s as 60 s; the 5% rate of the first minute must hold until 60 s have passed
+    start = 1609452000000
+    timestamps = [start + 600, start + 60599, start + 60600,
+                  start + 61600, start + 121200, start + 121600]
+    close = [100., 102., 102., 100., 102., 102.]
+    signal = [True, False, False, True, False, False]
+    loop, vectorized = run(make_bars(timestamps, close, signal), {'1': 0.05, '2': 0.01})
+    assert_same(loop, vectorized)
+    assert loop['sell_reason'].tolist() == ['ROI', 'ROI']
+    assert loop['duration'].tolist() == [60., 60.]
+    assert loop['start_time'].astype(np.int64).tolist() == [start + 600, start + 61600]
+
+
+@pytest.mark.parametrize('seed', range(3))
+def test_random_bars(seed):
+    random = np.random.default_rng(seed)
+    n = 1000
+    # bars are 5 to 40 s apart with any ms, so open durations often fall next to ROI breakpoints
+    timestamps = 1609452000000 + np.cumsum(random.integers(5000, 40000, n))
+    close = 100 * np.exp(np.cumsum(random.normal(0, 0.003, n)))
+    signal = random.random(n) < 0.05
+    loop, vectorized = run(make_bars(timestamps, close, signal), {'0': 0.02, '1': 0.01, '2.5': 0.004, '5': 0})
+    assert loop.shape[0] > 20
+    assert_same(loop, vectorized)
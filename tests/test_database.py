@@ -0,0 +1,70 @@
+import os
+import time
+import uuid
+import pytest
+
+from freqbot.database import DataHandler
+
+OLD_MAIN = """
+    CREATE TABLE MAIN (
+        id INTEGER NOT NULL PRIMARY KEY AUTOINCREMENT,
+        start_time DATETIME NOT NULL,
+        duration INTEGER NOT NULL,
+        start_price REAL NOT NULL,
+        end_price REAL NOT NULL,
+        ratio REAL NOT NULL,
+        sell_reason VARCHAR NOT NULL,
+        income REAL NOT NULL,
+        fee REAL NOT NULL,
+        pair VARCHAR NOT NULL,
+        algorithm VARCHAR NOT NULL,
+        stake_amount REAL NOT NULL,
+        order_type VARCHAR NOT NULL,
+        limit_type VARCHAR
+    );
+"""
+
+
+@pytest.fixture
+def filename():
+    name = 'test_' + uuid.uuid4().hex
+    yield name
+    path = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'databases', name + '.db')
+    for suffix in ['', '-wal', '-shm', '-journal']:
+        if os.path.exists(path + suffix):
+            os.remove(path + suffix)
+
+
+def write_old(filename: str, start_times: list) -> None:
+    connection = DataHandler.connect(filename)
+    with connection:
+        connection.execute(OLD_MAIN)
+        connection.execute('CREATE INDEX MAIN_PAIR_ALGORITHM_START_TIME ON MAIN (pair, algorithm, start_time)')
+        connection.executemany('INSERT INTO MAIN (start_time, duration, start_price, end_price, ratio, sell_reason, '
+                               'income, fee, pair, algorithm, stake_amount, order_type) '
+                               "VALUES (?, 1, 100, 101, 1.01, 'ROI', 0.1, 0.01, 'AAA', 'Quickie', 10, 'MARKET')",
+                               [(start_time, ) for start_time in start_times])
+    connection.close()
+
+
+def test_migrate_ctime_start_time(filename):
+    stamps = [1609459200000, 1609462800000]
+    write_old(filename, [time.ctime(stamps[0] / 1000), stamps[1]])
+    handler = DataHandler(filename)
+    types = {row[1]: row[2] for row in handler.connection.execute('PRAGMA table_info(MAIN)')}
+    assert types['start_time'] == 'INTEGER'
+    assert handler.select_trades('AAA', 'Quickie')['start_time'].tolist() == stamps
+    assert handler.select_trades('AAA', 'Quickie', start_time=stamps[1]).shape[0] == 1
+    handler.close()
+    # the migrated file opens as it is
+    DataHandler(filename).close()
+
+
+def test_unknown_start_time(filename):
+    write_old(filename, ['yesterday'])
+    with pytest.raises(ValueError, match='can not be migrated'):
+        DataHandler(filename)
+    # nothing was changed
+    connection = DataHandler.connect(filename)
+    assert connection.execute('SELECT start_time FROM MAIN').fetchall() == [('yesterday', )]
+    connection.close()
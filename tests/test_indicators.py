@@ -0,0 +1,68 @@
+import numpy as np
+import pandas as pd
+import pytest
+import talib.abstract as ta
+import freqtrade.vendor.qtpylib.indicators as qtpylib
+
+from freqbot.algos import Quickie
+from freqbot.indicators import SMA, EMA, TEMA, MACD, ADX, BollingerBands
+
+
+@pytest.fixture
+def bars() -> pd.DataFrame:
+    random = np.random.default_rng(0)
+    close = 100 + np.cumsum(random.normal(0, 1, 600))
+    spread = np.abs(random.normal(0, 0.5, (2, 600)))
+    return pd.DataFrame({'open': np.roll(close, 1), 'high': close + spread[0], 'low': close - spread[1],
+                         'close': close, 'volume': random.uniform(1, 10, 600)})
+
+
+def run(indicator, *columns: np.ndarray) -> np.ndarray:
+    return np.array([indicator.update(*values) for values in zip(*columns)], dtype=float)
+
+
+def assert_close(actual, expected) -> None:
+    # warm-up bars must be NaN in the same places
+    np.testing.assert_allclose(actual, np.asarray(expected, dtype=float), rtol=1e-7, atol=1e-7, equal_nan=True)
+
+
+@pytest.mark.parametrize('period', [1, 9, 200])
+def test_sma(bars, period):
+    assert_close(run(SMA(period), bars['close']), ta.SMA(bars, timeperiod=period))
+
+
+@pytest.mark.parametrize('period', [9, 30])
+def test_ema(bars, period):
+    assert_close(run(EMA(period), bars['close']), ta.EMA(bars, timeperiod=period))
+
+
+@pytest.mark.parametrize('period', [9, 30])
+def test_tema(bars, period):
+    assert_close(run(TEMA(period), bars['close']), ta.TEMA(bars, timeperiod=period))
+
+
+def test_macd(bars):
+    expected = ta.MACD(bars)
+    actual = run(MACD(12, 26, 9), bars['close'])
+    for i, column in enumerate(['macd', 'macdsignal', 'macdhist']):
+        assert_close(actual[:, i], expected[column])
+
+
+@pytest.mark.parametrize('period', [5, 14])
+def test_adx(bars, period):
+    assert_close(run(ADX(period), bars['high'], bars['low'], bars['close']), ta.ADX(bars, timeperiod=period))
+
+
+def test_bollinger_bands(bars):
+    expected = qtpylib.bollinger_bands(bars['close'], window=20, stds=2)
+    actual = run(BollingerBands(20, 2), bars['close'])
+    for i, column in enumerate(['lower', 'mid', 'upper']):
+        assert_close(actual[:, i], expected[column])
+
+
+def test_quickie_next_indicators(bars):
+    algorithm = Quickie('tick', 100)
+    expected = algorithm.update_indicators(bars.copy())
+    actual = pd.DataFrame([algorithm.next_indicators(bar) for bar in bars.to_dict('records')])
+    for column in actual.columns:
+        assert_close(actual[column], expected[column])
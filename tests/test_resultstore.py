@@ -0,0 +1,50 @@
+import uuid
+import shutil
+import numpy as np
+import pytest
+
+from freqbot.records import TRADE_DTYPE, TradeArray
+from freqbot.resultstore import ColumnarStore
+
+
+@pytest.fixture
+def store():
+    store = ColumnarStore('test_' + uuid.uuid4().hex, run='run', profile='backtest')
+    yield store
+    shutil.rmtree(store.path, ignore_errors=True)
+
+
+def make_trades() -> np.ndarray:
+    trades = TradeArray()
+    for i, (pair, algorithm, end_price) in enumerate([('AAA', 'Quickie', 101.), ('BBB', 'Quickie', 99.),
+                                                      ('AAA', 'Other', 102.), ('AAA', 'Quickie', 98.)]):
+        trades.append(np.datetime64(1609459200000 + 60000 * (3 - i), 'ms'), 30. * (i + 1), 100., end_price, 0.1,
+                      0.01, pair, algorithm, 'ROI')
+    return trades.array()
+
+
+def test_empty_merge(store):
+    trades = store.merge([])
+    assert trades.shape[0] == 0
+    store.write_statistics(trades)
+    assert store.select_trades('AAA', 'Quickie').empty
+    assert store.scan().shape[0] == 0
+
+
+def test_round_trip(store):
+    trades = make_trades()
+    store.insert_trades(trades)
+    assert store.scan().shape[0] == trades.shape[0]
+
+    selected = store.select_trades('AAA', 'Quickie')
+    assert selected['end_price'].tolist() == [98., 101.]
+    assert selected['start_time'].tolist() == [1609459200000, 1609459380000]
+    assert selected['duration'].tolist() == [2., 0.5]
+    assert store.select_trades('AAA', 'Quickie', start_time=1609459200001).shape[0] == 1
+
+    store.write_statistics(store.scan())
+    statistics = store.statistics()
+    total = statistics.loc[(statistics['pair'] == 'ALL') & (statistics['algo'] == 'ALL')]
+    assert total['num_total'].tolist() == [4]
+    assert np.isclose(total['total'].iloc[0], ((trades['end_price'] - 100.) * 0.1 - 0.01).sum())
+    assert store.scan().dtype == TRADE_DTYPE
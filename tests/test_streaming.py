@@ -0,0 +1,62 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from freqbot.benchmark import synthetic_trades
+from freqbot.streaming import StreamingBars
+
+CASES = [('TB', 20), ('TB', 7), ('VB', 37.), ('DB', 4000.)]
+
+
+def stream(builder: StreamingBars, trades: pd.DataFrame) -> pd.DataFrame:
+    bars = list()
+    for row in trades[['price', 'amount', 'cost', 'timestamp']].itertuples(index=False):
+        bar = builder.update(row.price, row.amount, row.cost, row.timestamp)
+        if bar is not None:
+            bars.append(bar)
+    return builder.frame(bars)
+
+
+def trailing(trades: pd.DataFrame, tick_type: str, tick_size) -> pd.DataFrame:
+    """
+    :return: trades after the last complete bar, the accessor leaves them out
+    """
+    if tick_type == 'TB':
+        return trades.iloc[trades.shape[0] - trades.shape[0] % tick_size:]
+    positions = trades[StreamingBars.measures[tick_type]].cumsum()
+    total = positions.iloc[-1]
+    return trades.loc[positions > np.floor(total - total % tick_size)]
+
+
+def assert_same(actual: pd.DataFrame, expected: pd.DataFrame) -> None:
+    assert list(actual.columns) == list(expected.columns)
+    assert actual.shape == expected.shape
+    assert (actual.index == expected.index).all()
+    np.testing.assert_allclose(actual.to_numpy(), expected.to_numpy(), rtol=1e-12)
+
+
+@pytest.mark.parametrize('tick_type, tick_size', CASES)
+@pytest.mark.parametrize('n', [2800, 2803])
+def test_matches_accessor(tick_type, tick_size, n):
+    trades = synthetic_trades(n, seed=3)
+    builder = StreamingBars(tick_type, tick_size)
+    assert_same(stream(builder, trades), getattr(trades.copy().bars, tick_type)(tick_size))
+
+    # the trailing incomplete bar is not emitted, the builder keeps its trades open
+    rest = trailing(trades, tick_type, tick_size)
+    if rest.empty:
+        assert builder.group is None
+    else:
+        assert np.isclose(builder.amount, rest['amount'].sum())
+        assert (builder.open, builder.close) == (rest['price'].iloc[0], rest['price'].iloc[-1])
+
+
+@pytest.mark.parametrize('tick_type, tick_size', CASES)
+@pytest.mark.parametrize('split', [1000, 1411])
+def test_prime(tick_type, tick_size, split):
+    trades = synthetic_trades(2800, seed=4)
+    history = trades.iloc[:split]
+    builder = StreamingBars(tick_type, tick_size)
+    builder.prime(history)
+    bars = pd.concat([getattr(history.copy().bars, tick_type)(tick_size), stream(builder, trades.iloc[split:])])
+    assert_same(bars, getattr(trades.copy().bars, tick_type)(tick_size))
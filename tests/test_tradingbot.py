@@ -0,0 +1,120 @@
+import logging
+import pytest
+from typing import Tuple
+
+from freqbot import TradingBot, AsyncTradingBot
+from freqbot.algos import BasicAlgorithm
+from freqbot.benchmark import synthetic_trades
+from freqbot.simulation import SimulatedExchange, SimulatedSocketManager
+
+PAIR = 'AAAUSDT'
+
+
+class EveryBar(BasicAlgorithm):
+    """
+    Buys on a bar when it is out of the market and sells on the next one
+    """
+    def update_indicators(self, dataframe):
+        return dataframe
+
+    def last_signals(self, data) -> Tuple[bool, bool]:
+        return True, False
+
+
+class Records(list):
+    def update(self, record):
+        self.append(record)
+
+    def close(self):
+        pass
+
+
+def make_bot(cls=TradingBot, history: int = 400, trades: int = 1000, **kwargs):
+    data = synthetic_trades(trades, seed=1)
+    exchange = SimulatedExchange({PAIR: data}, int(data['timestamp'].iloc[history - 1]))
+    bot = cls('', '', client=exchange, **kwargs)
+    bot.trade_source = exchange
+    bot.logger = logging.getLogger('test_tradingbot')
+    bot.meta.clock = exchange.clock
+    algorithm = EveryBar('TB', 20)
+    algorithm.roi = {"100000": 10}
+    bot.set_metadata(PAIR, 10, algorithm)
+    bot.data_handler = Records()
+    bot.set_history(exchange.history(PAIR))
+    return bot, exchange
+
+
+def report(side: str, status: str, quantity: float = 0.) -> dict:
+    return {'e': 'executionReport', 's': PAIR, 'c': 'test', 'S': side, 'o': 'MARKET', 'f': 'GTC',
+            'x': 'TRADE' if quantity else 'NEW', 'X': status, 'l': str(quantity), 'L': '100', 'n': '0.0001',
+            'N': 'BNB'}
+
+
+def test_buy_is_trading_once_filled():
+    bot, _ = make_bot()
+    bot.pending = 'BUY'
+    bot.handle_order(report('BUY', 'NEW'))
+    assert (bot.is_trading, bot.pending) == (False, 'BUY')
+    bot.handle_order(report('BUY', 'PARTIALLY_FILLED', 0.05))
+    assert (bot.is_trading, bot.pending) == (True, 'BUY')
+    bot.handle_order(report('BUY', 'FILLED', 0.05))
+    assert (bot.is_trading, bot.pending) == (True, None)
+
+
+@pytest.mark.parametrize('status', ['CANCELED', 'REJECTED', 'EXPIRED'])
+def test_terminal_status_clears_pending(status):
+    bot, _ = make_bot()
+    bot.pending = 'BUY'
+    bot.handle_order(report('BUY', status))
+    assert (bot.is_trading, bot.pending, bot.meta.start_time) == (False, None, None)
+
+    bot.is_trading, bot.pending = True, 'SELL'
+    bot.handle_order(report('SELL', status))
+    assert (bot.is_trading, bot.pending) == (True, None)
+    assert not bot.data_handler
+
+
+def test_report_before_response():
+    bot, exchange = make_bot()
+    create_order = exchange.create_order
+
+    def eager(**request):
+        # the execution report arrives before the response of the request
+        response = create_order(**request)
+        while exchange.reports:
+            bot.handle_order(exchange.reports.popleft())
+        return response
+
+    exchange.create_order = eager
+    exchange.prices[PAIR] = 100.
+    bot.price = 100.
+    bot.act('BUY', 'MARKET')
+    assert (bot.is_trading, bot.pending) == (True, None)
+    bot.act('SELL', 'MARKET')
+    assert (bot.is_trading, bot.pending) == (False, None)
+    assert len(bot.data_handler) == 1
+
+
+@pytest.mark.parametrize('cls, kwargs', [(TradingBot, {}), (AsyncTradingBot, {'metrics_interval': None})])
+def test_replay(cls, kwargs):
+    bot, exchange = make_bot(cls, **kwargs)
+    bot.listen(PAIR, SimulatedSocketManager(exchange))
+    sides = [order['side'] for order in exchange.orders]
+    assert len(sides) > 4 and sides[::2] == ['BUY'] * len(sides[::2]) and sides[1::2] == ['SELL'] * len(sides[1::2])
+    assert bot.pending is None and bot.is_trading == (len(sides) % 2 == 1)
+    records = bot.data_handler
+    assert len(records) == len(sides) // 2
+    for record in records:
+        assert record.pair == PAIR and record.algorithm_name == 'EveryBar'
+        assert record.end_time > record.start_time and record.end_price and record.start_price
+    assert sorted(record.open_time for record in records) == [record.open_time for record in records]
+
+
+def test_async_replay_matches_sync():
+    records = list()
+    for cls, kwargs in [(TradingBot, {}), (AsyncTradingBot, {'metrics_interval': None})]:
+        bot, exchange = make_bot(cls, **kwargs)
+        bot.listen(PAIR, SimulatedSocketManager(exchange))
+        records.append([(record.open_time, record.start_price, record.end_price, record.end_time)
+                        for record in bot.data_handler])
+    assert records[0] and records[0] == records[1]